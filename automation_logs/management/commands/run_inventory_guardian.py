@@ -41,14 +41,16 @@ class Command(BaseCommand):
             # ------------------------------------
             # 2. Fetch items to inspect
             # ------------------------------------
-            items_qs = get_inventory_items()
-            total_items_examined = items_qs.count()
+            # Load the (small) inventory item set once; its length is the
+            # count, so there's no separate COUNT(*) query before the loop.
+            items = list(get_inventory_items())
+            total_items_examined = len(items)
             mismatches = 0
 
             # One info line about volume
             log("info", f"InventoryGuardian will examine {total_items_examined} inventory item(s).")
 
-            for item in items_qs.iterator():
+            for item in items:
                 result = compare_item_totals(item)
 
                 if result['mismatch']:
@@ -18,12 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import RedirectView
 from reports.views_inventory_safe import SafeInventoryRecountView
-from django.http import FileResponse
-from pathlib import Path
-
-def download_report(request, filename):
-    path = Path("reports") / filename
-    return FileResponse(open(path, "rb"), as_attachment=True)
+from reports.views import download_report
 
 urlpatterns = [
     path("", RedirectView.as_view(url="/ledger/", permanent=False)),  # <— add this line
@@ -33,6 +28,7 @@ urlpatterns = [
         SafeInventoryRecountView.as_view(),
         name="safe-inventory-recount"),
     path("admin/reports/", include(("reports.urls_admin", "adminreports"), namespace="adminreports")),
+    path("reports/", include("reports.urls")),
     path("automation/", include("web_automation.urls")),
     #path("forbes-lawn/", include("forbes_lawn_dashboard.urls")),
     path("downloads/<str:filename>/", download_report),
@@ -9,12 +9,52 @@ from django.http import HttpResponse
 from django.db.models import Sum, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
+from decimal import Decimal
 import csv
+import functools
 
 from forbes_lawn_accounting.models import Invoice, SalesTaxSummary
 from django_ledger.models import EntityModel
 
 
+def _tax_cents(taxable_cents, rate_milli):
+    """
+    Tax in whole cents for an amount in cents at a rate given in
+    thousandths of a percent (6.5% -> 6500), rounded half-up.
+    """
+    return (taxable_cents * rate_milli + 50000) // 100000
+
+
+def _cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+# Standard Kansas tax rates
+STATE_RATE = Decimal('6.5')
+COUNTY_RATE = Decimal('1.475')  # Johnson County
+
+# City rates (from property data)
+CITY_RATES = {
+    'Mission': Decimal('1.75'),
+    'Olathe': Decimal('1.5'),
+    'Overland Park': Decimal('1.375'),
+    'Prairie Village': Decimal('1.0'),
+    'Westwood': Decimal('1.5'),
+    'Lenexa': Decimal('1.35'),
+}
+DEFAULT_CITY_RATE = Decimal('1.0')  # Default 1% if city not found
+
+# Jurisdiction label and rate in thousandths of a percent, built once.
+_STATE_JURISDICTION = (f'Kansas State ({STATE_RATE}%)', int(STATE_RATE * 1000))
+_COUNTY_JURISDICTION = (f'Kansas, Johnson County ({COUNTY_RATE}%)', int(COUNTY_RATE * 1000))
+
+
+@functools.lru_cache(maxsize=128)
+def _city_jurisdiction(city):
+    city_rate = CITY_RATES.get(city, DEFAULT_CITY_RATE)
+    return f'Kansas, {city} City ({city_rate}%)', int(city_rate * 1000)
+
+
 class SalesTaxReportView(TemplateView):
     template_name = 'forbes_lawn_accounting/sales_tax_report.html'
     
@@ -97,62 +137,45 @@ class SalesTaxReportView(TemplateView):
         Based on tax_rate_name field in invoices
         ALWAYS shows State and County headers, even if $0
         """
-        # Standard Kansas tax rates
-        state_rate = 6.5
-        county_rate = 1.475  # Johnson County
-        
-        # City rates (from property data)
-        city_rates = {
-            'Mission': 1.75,
-            'Olathe': 1.5,
-            'Overland Park': 1.375,
-            'Prairie Village': 1.0,
-            'Westwood': 1.5,
-            'Lenexa': 1.35,
-        }
-        
-        # Calculate taxable amount (sum of taxable line items)
+        # Calculate taxable amount (sum of taxable line items), in cents
         taxable_total = 0
         city_breakdowns = {}
         
         for invoice in invoices:
             if invoice.tax_amount and invoice.tax_amount > 0:
-                taxable_total += float(invoice.taxable_subtotal or 0)
+                taxable_cents = int((invoice.taxable_subtotal or 0) * 100)
+                taxable_total += taxable_cents
                 
                 # Parse city from property
                 if invoice.property:
                     city = invoice.property.city
                     if city not in city_breakdowns:
                         city_breakdowns[city] = 0
-                    city_breakdowns[city] += float(invoice.taxable_subtotal or 0)
+                    city_breakdowns[city] += taxable_cents
         
         # Build jurisdiction summary (like Jobber format)
         # ALWAYS include State and County, even if $0
         result = []
         
-        # State (ALWAYS shown)
-        result.append({
-            'name': f'Kansas State ({state_rate}%)',
-            'taxable': taxable_total,
-            'tax': taxable_total * (state_rate / 100),
-            'level': 'state'
-        })
-        
-        # County (ALWAYS shown - Johnson County is primary)
-        result.append({
-            'name': f'Kansas, Johnson County ({county_rate}%)',
-            'taxable': taxable_total,
-            'tax': taxable_total * (county_rate / 100),
-            'level': 'county'
-        })
+        # State and County (ALWAYS shown - Johnson County is primary)
+        for (name, rate_milli), level in (
+            (_STATE_JURISDICTION, 'state'),
+            (_COUNTY_JURISDICTION, 'county'),
+        ):
+            result.append({
+                'name': name,
+                'taxable': _cents(taxable_total),
+                'tax': _cents(_tax_cents(taxable_total, rate_milli)),
+                'level': level
+            })
         
         # Cities (only show if there's revenue in that city)
         for city, amount in city_breakdowns.items():
-            city_rate = city_rates.get(city, 1.0)  # Default 1% if city not found
+            name, rate_milli = _city_jurisdiction(city)
             result.append({
-                'name': f'Kansas, {city} City ({city_rate}%)',
-                'taxable': amount,
-                'tax': amount * (city_rate / 100),
+                'name': name,
+                'taxable': _cents(amount),
+                'tax': _cents(_tax_cents(amount, rate_milli)),
                 'level': 'city'
             })
         
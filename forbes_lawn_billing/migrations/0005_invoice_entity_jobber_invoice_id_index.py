@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forbes_lawn_billing', '0004_invoice_jobber_job_numbers_raw'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['entity', 'jobber_invoice_id'], name='flb_inv_entity_jobber_id_idx'),
+        ),
+    ]
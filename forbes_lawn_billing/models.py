@@ -223,6 +223,10 @@ class Invoice(models.Model):
 
     class Meta:
         ordering = ["-invoice_date", "-id"]
+        indexes = [
+            # Jobber imports look invoices up by entity + Jobber invoice ID.
+            models.Index(fields=["entity", "jobber_invoice_id"], name="flb_inv_entity_jobber_id_idx"),
+        ]
 
       
 
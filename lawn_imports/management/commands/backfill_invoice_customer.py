@@ -52,6 +52,15 @@ class Command(BaseCommand):
         # preload customers for faster fallback matching
         customers = list(CustomerModel.objects.filter(entity_model=entity).only("uuid", "customer_name", "email"))
         by_norm_name = {norm_name(c.customer_name): c for c in customers if c.customer_name}
+        # email / exact-name matches resolve from the same preload
+        # (case-insensitive, first customer wins like .first())
+        by_email = {}
+        by_lower_name = {}
+        for c in customers:
+            if c.email:
+                by_email.setdefault(c.email.lower(), c)
+            if c.customer_name:
+                by_lower_name.setdefault(c.customer_name.lower(), c)
 
         for inv in qs.iterator(chunk_size=500):
             if inv.customer_id:
@@ -65,17 +74,11 @@ class Command(BaseCommand):
 
             # 1) email match (strong)
             if email:
-                customer = CustomerModel.objects.filter(
-                    entity_model=entity,
-                    email__iexact=email,
-                ).first()
+                customer = by_email.get(email.lower())
 
             # 2) exact name match
             if customer is None and name:
-                customer = CustomerModel.objects.filter(
-                    entity_model=entity,
-                    customer_name__iexact=name,
-                ).first()
+                customer = by_lower_name.get(name.lower())
 
             # 3) normalized name fallback (fast, local dict)
             if customer is None and name:
@@ -96,6 +99,9 @@ class Command(BaseCommand):
                 )
                 created_customers += 1
                 by_norm_name[norm_name(name)] = customer
+                if email:
+                    by_email.setdefault(email.lower(), customer)
+                by_lower_name.setdefault(name.lower(), customer)
 
             if customer is None:
                 skipped_no_match += 1
@@ -1,19 +1,199 @@
 # lawn_imports/management/commands/import_jobber_invoices.py
 
 import csv
+import functools
 import re
+from datetime import date, datetime
 from decimal import Decimal
+from itertools import islice
 from pathlib import Path
 
 from django.apps import apps
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.utils import timezone
 
 from django_ledger.models.entity import EntityModel
-from django_ledger.models import CustomerModel
 
 from forbes_lawn_billing.models import Invoice, InvoiceLine, InvoiceStatus
-from lawn_imports.utils import get_or_create_dl_customer_for_jobber
+from lawn_imports.utils import (
+    create_missing_dl_customers,
+    customer_cache_key,
+    get_or_create_dl_customer_for_jobber,
+    prefetch_dl_customers,
+)
+
+# Rows handled per transaction; new invoices and their lines are inserted
+# with one bulk_create per chunk.
+ROW_CHUNK_SIZE = 500
+
+# Read buffer for the CSV file (1 MiB).
+_CSV_BUFFER_SIZE = 1 << 20
+
+_D0 = Decimal("0.00")
+_MONEY_TT = str.maketrans("", "", "$,")
+
+_TAX_PCT_RE = re.compile(r"([\d.]+)\s*%")
+_LEADING_SEP_RE = re.compile(r"^[,\s]+")
+_LINE_ITEM_RE = re.compile(
+    r"""
+    (?P<name>[^()]+?)        # text up to '(' (no parentheses)
+    \(\s*
+    (?P<qty>[\d.]+)          # quantity
+    \s*,\s*\$
+    (?P<rate>[\d.]+)         # rate
+    \s*\)
+    """,
+    re.VERBOSE,
+)
+
+_MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+
+
+def parse_date(value: str):
+    """
+    Jobber actual format: 'Nov 19, 2025'
+    """
+    if not value:
+        return None
+    v = value.strip()
+    if not v or v == "-":
+        return None
+    # Fast path for 'Nov 19, 2025' without going through strptime.
+    parts = v.split()
+    if len(parts) == 3:
+        mon, day, year = parts
+        month = _MONTHS.get(mon.lower())
+        if (
+            month
+            and day.endswith(",")
+            and 1 <= len(day) - 1 <= 2
+            and day[:-1].isdigit()
+            and len(year) == 4
+            and year.isdigit()
+        ):
+            try:
+                return date(int(year), month, int(day[:-1]))
+            except ValueError:
+                pass
+    # Try 'Nov 19, 2025'
+    try:
+        return datetime.strptime(v, "%b %d, %Y").date()
+    except ValueError:
+        # Try alternate format '19-Nov-25' just in case
+        try:
+            return datetime.strptime(v, "%d-%b-%y").date()
+        except ValueError:
+            raise ValueError(f"Unrecognized date format: {value}")
+
+
+def parse_decimal(value: str) -> Decimal:
+    if value is None:
+        return _D0
+    v = value.strip()
+    # Jobber writes '-' for empty money cells.
+    if not v or v == "-":
+        return _D0
+    if "$" in v or "," in v:
+        v = v.translate(_MONEY_TT)
+    return Decimal(v)
+
+
+@functools.lru_cache(maxsize=256)
+def parse_tax_rate_percent(value: str) -> Decimal:
+    """
+    e.g. "KS-Johnson-Prairie Village (8.975%)" -> Decimal("8.975")
+    or "-" or "" -> Decimal("0.0")
+    """
+    if not value:
+        return Decimal("0.0")
+    m = _TAX_PCT_RE.search(value)
+    if m:
+        return Decimal(m.group(1))
+    return Decimal("0.0")
+
+
+@functools.lru_cache(maxsize=256)
+def parse_status(raw_status: str) -> str:
+    """
+    Map Jobber's Status column into our InvoiceStatus enum.
+    """
+    if not raw_status:
+        return InvoiceStatus.DRAFT
+    s = raw_status.strip().lower()
+    if "paid" in s:
+        return InvoiceStatus.PAID
+    if "draft" in s:
+        return InvoiceStatus.DRAFT
+    if "void" in s or "canceled" in s:
+        return InvoiceStatus.VOID
+    # Sent, Awaiting payment, etc. -> treat as OPEN
+    return InvoiceStatus.OPEN
+
+
+def parse_line_items(text: str, tax_rate_percent: Decimal, subtotal: Decimal):
+    """
+    Parse Jobber's 'Line items' column into a list of dicts.
+
+    Handles strings like:
+        "2025 Lawn Treatments (1, $58), Tip  (1, $9)"
+
+    Returns:
+        [
+            {"name": "2025 Lawn Treatments", qty=1, rate=58, taxable=True},
+            {"name": "Tip",                  qty=1, rate=9,  taxable=True},
+        ]
+
+    We ignore zero-dollar lines like 'Tip  (1, $0)'.
+    """
+    items = []
+    if not text:
+        return items
+
+    taxable_flag = tax_rate_percent > 0
+
+    # Match every "Name (qty, $rate)" in the whole string.
+    for m in _LINE_ITEM_RE.finditer(text):
+        raw_name = m.group("name")
+
+        # Remove leading commas/spaces, then trailing commas, then trim
+        name = _LEADING_SEP_RE.sub("", raw_name).rstrip(",").strip()
+
+        qty = Decimal(m.group("qty"))
+        rate = Decimal(m.group("rate"))
+
+        # Ignore zero-dollar lines (e.g. 'Tip  (1, $0)')
+        if rate == 0:
+            continue
+
+        # Normalize any line that *contains* 'tip' into 'Tip'
+        if "tip" in name.lower():
+            name = "Tip"
+
+        items.append(
+            {
+                "name": name or "Service",
+                "qty": qty,
+                "rate": rate,
+                "taxable": taxable_flag,
+            }
+        )
+
+    # Fallback: if nothing matched but we have a subtotal, treat as one service line
+    if not items and subtotal:
+        items.append(
+            {
+                "name": text.strip(),
+                "qty": Decimal("1.0"),
+                "rate": subtotal,
+                "taxable": taxable_flag,
+            }
+        )
+
+    return items
 
 
 class Command(BaseCommand):
@@ -32,12 +212,18 @@ class Command(BaseCommand):
             action="store_true",
             help="Simulate the import without saving any changes.",
         )
+        parser.add_argument(
+            "--quiet",
+            action="store_true",
+            help="Skip per-invoice output; only print the final summary.",
+        )
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.NOTICE(">>> RUNNING NEW V4 IMPORTER <<<"))
         csv_path = Path(options["csv_path"])
         entity_name = options["entity"]
         dry_run = options["dry_run"]
+        quiet = options["quiet"]
 
         if not csv_path.exists():
             raise CommandError(f"CSV file not found: {csv_path}")
@@ -78,349 +264,319 @@ class Command(BaseCommand):
             "tax_amount": "Tax amount ($)",
         }
 
-        def parse_decimal(value: str) -> Decimal:
-            if value is None:
-                return Decimal("0.00")
-            v = value.strip()
-            if not v:
-                return Decimal("0.00")
-            v = v.replace("$", "").replace(",", "")
-            return Decimal(v)
-
-        def parse_date(value: str):
-            """
-            Jobber actual format: 'Nov 19, 2025'
-            """
-            if not value:
-                return None
-            v = value.strip()
-            if not v or v == "-":
-                return None
-            # Try 'Nov 19, 2025'
-            try:
-                return timezone.datetime.strptime(v, "%b %d, %Y").date()
-            except ValueError:
-                # Try alternate format '19-Nov-25' just in case
-                try:
-                    return timezone.datetime.strptime(v, "%d-%b-%y").date()
-                except ValueError:
-                    raise ValueError(f"Unrecognized date format: {value}")
-
-        def parse_tax_rate_percent(value: str) -> Decimal:
-            """
-            e.g. "KS-Johnson-Prairie Village (8.975%)" -> Decimal("8.975")
-            or "-" or "" -> Decimal("0.0")
-            """
-            if not value:
-                return Decimal("0.0")
-            m = re.search(r"([\d.]+)\s*%", value)
-            if m:
-                return Decimal(m.group(1))
-            return Decimal("0.0")
-
-        def parse_status(raw_status: str) -> str:
-            """
-            Map Jobber's Status column into our InvoiceStatus enum.
-            """
-            if not raw_status:
-                return InvoiceStatus.DRAFT
-            s = raw_status.strip().lower()
-            if "paid" in s:
-                return InvoiceStatus.PAID
-            if "draft" in s:
-                return InvoiceStatus.DRAFT
-            if "void" in s or "canceled" in s:
-                return InvoiceStatus.VOID
-            # Sent, Awaiting payment, etc. -> treat as OPEN
-            return InvoiceStatus.OPEN
-
-        def parse_line_items(text: str, tax_rate_percent: Decimal, subtotal: Decimal):
-            """
-            Parse Jobber's 'Line items' column into a list of dicts.
-
-            Handles strings like:
-                "2025 Lawn Treatments (1, $58), Tip  (1, $9)"
-
-            Returns:
-                [
-                    {"name": "2025 Lawn Treatments", qty=1, rate=58, taxable=True},
-                    {"name": "Tip",                  qty=1, rate=9,  taxable=True},
-                ]
-
-            We ignore zero-dollar lines like 'Tip  (1, $0)'.
-            """
-            items = []
-            if not text:
-                return items
-
-            taxable_flag = tax_rate_percent > 0
-
-            # Match every "Name (qty, $rate)" in the whole string.
-            pattern = re.compile(
-                r"""
-                (?P<name>[^()]+?)        # text up to '(' (no parentheses)
-                \(\s*
-                (?P<qty>[\d.]+)          # quantity
-                \s*,\s*\$
-                (?P<rate>[\d.]+)         # rate
-                \s*\)
-                """,
-                re.VERBOSE,
-            )
-
-            for m in pattern.finditer(text):
-                raw_name = m.group("name")
-
-                # Remove leading commas/spaces, then trailing commas, then trim
-                name = re.sub(r"^[,\s]+", "", raw_name).rstrip(",").strip()
-
-                qty = Decimal(m.group("qty"))
-                rate = Decimal(m.group("rate"))
-
-                # Ignore zero-dollar lines (e.g. 'Tip  (1, $0)')
-                if rate == 0:
-                    continue
-
-                # Normalize any line that *contains* 'tip' into 'Tip'
-                if "tip" in name.lower():
-                    name = "Tip"
-
-
-                items.append(
-                    {
-                        "name": name or "Service",
-                        "qty": qty,
-                        "rate": rate,
-                        "taxable": taxable_flag,
-                    }
-                )
-
-            # Fallback: if nothing matched but we have a subtotal, treat as one service line
-            if not items and subtotal:
-                items.append(
-                    {
-                        "name": text.strip(),
-                        "qty": Decimal("1.0"),
-                        "rate": subtotal,
-                        "taxable": taxable_flag,
-                    }
-                )
-
-            return items
-
         created_invoices = 0
         updated_invoices = 0
         created_lines = 0
 
-        with csv_path.open("r", newline="", encoding="utf-8-sig") as f:
-            reader = csv.DictReader(f)
-
-            for row in reader:
-                invoice_number = (row.get(COLUMN["invoice_number"]) or "").strip()
-                if not invoice_number:
-                    # Skip rows without an invoice number
-                    continue
-
-                customer_name = (row.get(COLUMN["customer_name"]) or "").strip()
-                client_email = (row.get(COLUMN["client_email"]) or "").strip()
-                client_phone = (row.get(COLUMN["client_phone"]) or "").strip()
-
-                bill_to_line1 = (row.get(COLUMN["bill_to_line1"]) or "").strip()
-                bill_to_city = (row.get(COLUMN["bill_to_city"]) or "").strip()
-                bill_to_state = (row.get(COLUMN["bill_to_state"]) or "").strip()
-                bill_to_zip = (row.get(COLUMN["bill_to_zip"]) or "").strip()
-
-                invoice_date = parse_date(row.get(COLUMN["invoice_date"]))
-                due_date = parse_date(row.get(COLUMN["due_date"]))
-                status_raw = (row.get(COLUMN["status"]) or "").strip()
-                status = parse_status(status_raw)
-
-                subtotal_csv = parse_decimal(row.get(COLUMN["subtotal"]))
-                total_csv = parse_decimal(row.get(COLUMN["total"]))
-                balance_csv = parse_decimal(row.get(COLUMN["balance"]))
-                deposit_csv = parse_decimal(row.get(COLUMN["deposit"]))
-                discount_csv = parse_decimal(row.get(COLUMN["discount"]))
-                tax_amount_csv = parse_decimal(row.get(COLUMN["tax_amount"]))
-                tax_rate_percent = parse_tax_rate_percent(row.get(COLUMN["tax_percent"]))
-                tip_amount_csv = parse_decimal(row.get(COLUMN["tip"]))  # still parsed for debug/possible future use
-
-                raw_line_items_text = row.get(COLUMN["line_items"]) or ""
-                line_items = parse_line_items(
-                    raw_line_items_text,
-                    tax_rate_percent,
-                    subtotal_csv,
-                )
-                self.stdout.write(
-                    self.style.NOTICE(
-                        f"[DEBUG] invoice #{invoice_number} raw_line_items={raw_line_items_text!r} "
-                        f"-> parsed={line_items!r}"
-                    )
-                )
-
-                # 🔹 Resolve or simulate the Django Ledger customer
-                customer_action_label = "N/A"
-                dl_customer = None
-                created_customer = False
-
-                if dry_run:
-                    # Dry-run: don't create customers, just check whether they'd be new or existing
-                    qs = CustomerModel.objects.filter(
-                        entity_model=entity,
-                        customer_name=customer_name,
-                    )
-                    if client_email:
-                        qs = qs.filter(email__iexact=client_email)
-
-                    if qs.exists():
-                        customer_action_label = "EXISTING CUSTOMER"
-                    else:
-                        customer_action_label = "WOULD CREATE CUSTOMER"
-                else:
-                    dl_customer, created_customer = get_or_create_dl_customer_for_jobber(
+        with csv_path.open("r", newline="", encoding="utf-8-sig", buffering=_CSV_BUFFER_SIZE) as f:
+            # Customers shared with get_or_create_dl_customer_for_jobber (see
+            # lawn_imports.utils), loaded per chunk for names not seen yet.
+            customer_cache = {}
+            loaded_names = set()
+
+            # Case-fold item names once in Python; a name__iexact filter per line
+            # can't use the plain b-tree index on name. Missing items are not
+            # auto-created, so one query up front covers every line.
+            # ItemModel's manager select_related()s uom, which only() can't
+            # defer, so that join is dropped first.
+            items_by_lower = {}
+            if not dry_run:
+                for item in ItemModel.objects.filter(entity=entity).select_related(None).only("name"):
+                    items_by_lower.setdefault(item.name.lower(), item)
+
+            # Plain csv.reader rows indexed by header position (no per-row dict).
+            # Rows are cut/padded to the header width plus one blank cell, which
+            # columns missing from the header point at.
+            rows = csv.reader(f)
+            header = next(rows, [])
+            width = len(header)
+            position = {name: i for i, name in enumerate(header)}
+            col = {key: position.get(name, width) for key, name in COLUMN.items()}
+            ci_invoice = col["invoice_number"]
+            blank = [""] * (width + 1)
+
+            # New customers are created in a first pass, each committed on its
+            # own, rather than inside the import-wide transaction below, so the
+            # per-customer creation lock isn't held for the whole import.
+            new_customer_pks = set()
+            if not dry_run:
+                ci_name, ci_email, ci_phone = col["customer_name"], col["client_email"], col["client_phone"]
+                customer_rows = {}
+                for row in rows:
+                    row = row[:width]
+                    row.extend(blank[len(row):])
+                    if not row[ci_invoice].strip():
+                        continue
+                    customer_row = (row[ci_name].strip(), row[ci_email].strip(), row[ci_phone].strip())
+                    customer_rows.setdefault(customer_cache_key(*customer_row[:2]), customer_row)
+                names = {name for name, _, _ in customer_rows.values()}
+                prefetch_dl_customers(entity, names, customer_cache)
+                loaded_names |= names
+                new_customer_pks = create_missing_dl_customers(entity, customer_rows.values(), customer_cache)
+                del customer_rows
+
+                f.seek(0)
+                rows = csv.reader(f)
+                next(rows, [])
+
+            # One transaction for the whole import; each chunk is a savepoint
+            # inside it.
+            with transaction.atomic():
+                while True:
+                    chunk = list(islice(rows, ROW_CHUNK_SIZE))
+                    if not chunk:
+                        break
+
+                    # Load this chunk's customers and invoices up front, so the CSV
+                    # is read once and rows resolve from dicts.
+                    chunk_rows = []
+                    for row in chunk:
+                        row = row[:width]
+                        row.extend(blank[len(row):])
+                        if row[ci_invoice].strip():
+                            chunk_rows.append(row)
+                    names = {
+                        row[col["customer_name"]].strip()
+                        for row in chunk_rows
+                    } - loaded_names
+                    if names:
+                        prefetch_dl_customers(entity, names, customer_cache)
+                        loaded_names |= names
+
+                    invoices_by_jid = {}
+                    for existing in Invoice.objects.filter(
                         entity=entity,
-                        client_name=customer_name,
-                        client_email=client_email,
-                        client_phone=client_phone,
-                    )
-                    customer_action_label = (
-                        "NEW CUSTOMER" if created_customer else "EXISTING CUSTOMER"
-                    )
-
-                # Get or create invoice by (entity, jobber_invoice_id)
-                jobber_invoice_id = invoice_number
-
-                invoice = Invoice.objects.filter(
-                    entity=entity, jobber_invoice_id=jobber_invoice_id
-                ).first()
-
-                created = False
-                if invoice is None:
-                    invoice = Invoice(
-                        entity=entity,
-                        jobber_invoice_id=jobber_invoice_id,
-                    )
-                    created = True
-
-                # Header fields
-                if not dry_run:
-                    invoice.customer = dl_customer  # 🔹 link to Django Ledger customer
-
-                invoice.invoice_number = invoice_number
-                invoice.customer_name = customer_name
-                invoice.email_to = client_email
-
-                invoice.bill_to_name = customer_name
-                invoice.bill_to_line1 = bill_to_line1
-                invoice.bill_to_city = bill_to_city
-                invoice.bill_to_state = bill_to_state
-                invoice.bill_to_zip = bill_to_zip
-
-                invoice.invoice_date = (
-                    invoice_date or invoice.invoice_date or timezone.localdate()
-                )
-                invoice.due_date = due_date or invoice.due_date
-
-                invoice.status = status
-
-                # Discount & tax info: let Jobber totals drive the math
-                invoice.discount_amount = discount_csv
-                invoice.deposit_amount = deposit_csv
-                invoice.tax_rate_percent = tax_rate_percent
-
-                if dry_run:
-                    action = "CREATE" if created else "UPDATE"
-                    self.stdout.write(
-                        f"[DRY RUN] {action} invoice #{invoice_number} for {customer_name} "
-                        f"({customer_action_label}, subtotal={subtotal_csv}, "
-                        f"total={total_csv}, tax%={tax_rate_percent}, tip={tip_amount_csv})"
-                    )
-                    # We don't touch DB in dry run
-                    continue
-
-                # Save the invoice header first so we have an ID
-                invoice.save()
-
-                if created:
-                    created_invoices += 1
-                    action = "CREATED"
-                else:
-                    updated_invoices += 1
-                    action = "UPDATED"
-
-                self.stdout.write(
-                    f"[{action}] Invoice {invoice.invoice_number} ({customer_name}) "
-                    f"[{customer_action_label}]"
-                )
-
-                # Clear existing lines and recreate from CSV
-                invoice.lines.all().delete()
-
-                line_number = 1
-                for li in line_items:
-                    item_name = li["name"]
-
-                    # 🔍 Try to find an existing ItemModel for this entity + name
-                    item_model = ItemModel.objects.filter(
-                        entity=entity,
-                        name__iexact=item_name,
-                    ).first()
-
-                    if item_model is None:
-                        # For now, DON'T auto-create – just warn and let the line be text-only.
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f"[DEBUG] No ItemModel found. item_name={repr(item_name)} "
-                                f"(entity={entity.slug})"
+                        jobber_invoice_id__in={
+                            row[ci_invoice].strip() for row in chunk_rows
+                        },
+                    ).order_by("pk"):
+                        invoices_by_jid.setdefault(existing.jobber_invoice_id, existing)
+
+                    # Invoices first seen in this chunk, and the lines to (re)write
+                    # per invoice, both keyed by Jobber invoice id; flushed below.
+                    new_invoices = {}
+                    pending_lines = {}
+                    # Per-row output is buffered and written once per chunk.
+                    pending_output = []
+
+                    with transaction.atomic():
+                        for row in chunk_rows:
+                            invoice_number = row[ci_invoice].strip()
+
+                            customer_name = row[col["customer_name"]].strip()
+                            client_email = row[col["client_email"]].strip()
+                            client_phone = row[col["client_phone"]].strip()
+
+                            bill_to_line1 = row[col["bill_to_line1"]].strip()
+                            bill_to_city = row[col["bill_to_city"]].strip()
+                            bill_to_state = row[col["bill_to_state"]].strip()
+                            bill_to_zip = row[col["bill_to_zip"]].strip()
+
+                            invoice_date = parse_date(row[col["invoice_date"]])
+                            due_date = parse_date(row[col["due_date"]])
+                            status_raw = row[col["status"]].strip()
+                            status = parse_status(status_raw)
+
+                            subtotal_csv = parse_decimal(row[col["subtotal"]])
+                            total_csv = parse_decimal(row[col["total"]])
+                            balance_csv = parse_decimal(row[col["balance"]])
+                            deposit_csv = parse_decimal(row[col["deposit"]])
+                            discount_csv = parse_decimal(row[col["discount"]])
+                            tax_amount_csv = parse_decimal(row[col["tax_amount"]])
+                            tax_rate_percent = parse_tax_rate_percent(row[col["tax_percent"]])
+                            tip_amount_csv = parse_decimal(row[col["tip"]])  # still parsed for debug/possible future use
+
+                            raw_line_items_text = row[col["line_items"]]
+                            line_items = parse_line_items(
+                                raw_line_items_text,
+                                tax_rate_percent,
+                                subtotal_csv,
                             )
-                        )
-
-                    line = InvoiceLine(
-                        invoice=invoice,
-                        line_number=line_number,
-                        item_model=item_model,
-                        item_name=item_name,  # snapshot name
-                        description="",
-                        quantity=li["qty"],
-                        rate=li["rate"],
-                        taxable=li["taxable"],
-                    )
-                    line.recompute_amount()
-                    line.save()
-                    created_lines += 1
-                    line_number += 1
-
-                # TRUST JOBBER TOTALS INSTEAD OF RECOMPUTING FROM LINES
-                invoice.subtotal = subtotal_csv
-                invoice.tax_amount = tax_amount_csv
-                invoice.total = total_csv
-                invoice.tax_rate_percent = tax_rate_percent
-                invoice.discount_amount = discount_csv
-                invoice.deposit_amount = deposit_csv
-
-                # Derive amount_paid / balance from Jobber's balance column
-                invoice.balance_due = balance_csv
-                invoice.amount_paid = (
-                    (invoice.total or Decimal("0.00")) - invoice.balance_due
-                )
-
-                # Status based on balance
-                if invoice.balance_due <= Decimal("0.00"):
-                    invoice.status = InvoiceStatus.PAID
-                    invoice.paid_in_full = True
-                elif invoice.amount_paid > Decimal("0.00"):
-                    invoice.status = InvoiceStatus.PARTIALLY_PAID
-                    invoice.paid_in_full = False
-                else:
-                    invoice.status = InvoiceStatus.OPEN
-                    invoice.paid_in_full = False
-
-                invoice.save()
-
-                # If Jobber's balance is 0, mark as paid (reinforce)
-                if balance_csv <= Decimal("0.00"):
-                    invoice.status = InvoiceStatus.PAID
-                    invoice.paid_in_full = True
-                invoice.save()
+                            if not quiet:
+                                pending_output.append(
+                                    self.style.NOTICE(
+                                        f"[DEBUG] invoice #{invoice_number} raw_line_items={raw_line_items_text!r} "
+                                        f"-> parsed={line_items!r}"
+                                    )
+                                )
+
+                            # 🔹 Resolve or simulate the Django Ledger customer
+                            customer_action_label = "N/A"
+                            dl_customer = None
+                            created_customer = False
+
+                            dl_customer = customer_cache.get(customer_cache_key(customer_name, client_email))
+
+                            if dry_run:
+                                # Dry-run: don't create customers, just check whether they'd be new or existing
+                                if dl_customer is not None:
+                                    customer_action_label = "EXISTING CUSTOMER"
+                                else:
+                                    customer_action_label = "WOULD CREATE CUSTOMER"
+                            elif dl_customer is not None:
+                                if dl_customer.pk in new_customer_pks:
+                                    # Created in the first pass for this row; report it as before.
+                                    new_customer_pks.discard(dl_customer.pk)
+                                    created_customer = True
+                                    customer_action_label = "NEW CUSTOMER"
+                                else:
+                                    customer_action_label = "EXISTING CUSTOMER"
+                            else:
+                                dl_customer, created_customer = get_or_create_dl_customer_for_jobber(
+                                    entity=entity,
+                                    client_name=customer_name,
+                                    client_email=client_email,
+                                    client_phone=client_phone,
+                                    cache=customer_cache,
+                                )
+                                customer_action_label = (
+                                    "NEW CUSTOMER" if created_customer else "EXISTING CUSTOMER"
+                                )
+
+                            # Get or create invoice by (entity, jobber_invoice_id)
+                            jobber_invoice_id = invoice_number
+
+                            # A repeated invoice # in this chunk reuses the unsaved instance.
+                            invoice = new_invoices.get(jobber_invoice_id) or invoices_by_jid.get(
+                                jobber_invoice_id
+                            )
+
+                            created = False
+                            if invoice is None:
+                                invoice = Invoice(
+                                    entity=entity,
+                                    jobber_invoice_id=jobber_invoice_id,
+                                )
+                                created = True
+
+                            if dry_run:
+                                action = "CREATE" if created else "UPDATE"
+                                if not quiet:
+                                    pending_output.append(
+                                        f"[DRY RUN] {action} invoice #{invoice_number} for {customer_name} "
+                                        f"({customer_action_label}, subtotal={subtotal_csv}, "
+                                        f"total={total_csv}, tax%={tax_rate_percent}, tip={tip_amount_csv})"
+                                    )
+                                # We don't touch DB in dry run
+                                continue
+
+                            # Header fields (dry runs never save, so they skip this)
+                            invoice.customer = dl_customer  # 🔹 link to Django Ledger customer
+
+                            invoice.invoice_number = invoice_number
+                            invoice.customer_name = customer_name
+                            invoice.email_to = client_email
+
+                            invoice.bill_to_name = customer_name
+                            invoice.bill_to_line1 = bill_to_line1
+                            invoice.bill_to_city = bill_to_city
+                            invoice.bill_to_state = bill_to_state
+                            invoice.bill_to_zip = bill_to_zip
+
+                            invoice.invoice_date = (
+                                invoice_date or invoice.invoice_date or timezone.localdate()
+                            )
+                            invoice.due_date = due_date or invoice.due_date
+
+                            invoice.status = status
+
+                            if created:
+                                created_invoices += 1
+                                action = "CREATED"
+                            else:
+                                updated_invoices += 1
+                                action = "UPDATED"
+
+                            if not quiet:
+                                pending_output.append(
+                                    f"[{action}] Invoice {invoice.invoice_number} ({customer_name}) "
+                                    f"[{customer_action_label}]"
+                                )
+
+                            # Existing lines are replaced from the CSV when the chunk is flushed.
+                            invoice_lines = []
+                            for line_number, li in enumerate(line_items, start=1):
+                                item_name = li["name"]
+
+                                # 🔍 Try to find an existing ItemModel for this entity + name
+                                item_model = items_by_lower.get(item_name.lower())
+
+                                if item_model is None:
+                                    # For now, DON'T auto-create – just warn and let the line be text-only.
+                                    if not quiet:
+                                        pending_output.append(
+                                            self.style.WARNING(
+                                                f"[DEBUG] No ItemModel found. item_name={repr(item_name)} "
+                                                f"(entity={entity.slug})"
+                                            )
+                                        )
+
+                                line = InvoiceLine(
+                                    invoice=invoice,
+                                    line_number=line_number,
+                                    item_model=item_model,
+                                    item_name=item_name,  # snapshot name
+                                    description="",
+                                    quantity=li["qty"],
+                                    rate=li["rate"],
+                                    taxable=li["taxable"],
+                                )
+                                line.recompute_amount()
+                                invoice_lines.append(line)
+                            pending_lines[jobber_invoice_id] = (invoice, invoice_lines)
+
+                            # TRUST JOBBER TOTALS INSTEAD OF RECOMPUTING FROM LINES
+                            # (discount & tax info included: Jobber totals drive the math)
+                            invoice.subtotal = subtotal_csv
+                            invoice.tax_amount = tax_amount_csv
+                            invoice.total = total_csv
+                            invoice.tax_rate_percent = tax_rate_percent
+                            invoice.discount_amount = discount_csv
+                            invoice.deposit_amount = deposit_csv
+
+                            # Derive amount_paid / balance from Jobber's balance column
+                            invoice.balance_due = balance_csv
+                            invoice.amount_paid = (
+                                (invoice.total or Decimal("0.00")) - invoice.balance_due
+                            )
+
+                            # Status based on balance
+                            if invoice.balance_due <= Decimal("0.00"):
+                                invoice.status = InvoiceStatus.PAID
+                                invoice.paid_in_full = True
+                            elif invoice.amount_paid > Decimal("0.00"):
+                                invoice.status = InvoiceStatus.PARTIALLY_PAID
+                                invoice.paid_in_full = False
+                            else:
+                                invoice.status = InvoiceStatus.OPEN
+                                invoice.paid_in_full = False
+
+                            # New invoices are bulk-inserted with the chunk; existing ones
+                            # are written in place.
+                            if created:
+                                new_invoices[jobber_invoice_id] = invoice
+                            elif invoice.pk is not None:
+                                invoice.save()
+
+                        if new_invoices:
+                            Invoice.objects.bulk_create(new_invoices.values(), batch_size=500)
+                        replaced_ids = [
+                            pending_invoice.pk
+                            for jobber_id, (pending_invoice, _) in pending_lines.items()
+                            if jobber_id not in new_invoices
+                        ]
+                        if replaced_ids:
+                            InvoiceLine.objects.filter(invoice_id__in=replaced_ids).delete()
+                        new_lines = [
+                            line
+                            for _, invoice_lines in pending_lines.values()
+                            for line in invoice_lines
+                        ]
+                        InvoiceLine.objects.bulk_create(new_lines, batch_size=500)
+                        created_lines += len(new_lines)
+
+                    if pending_output:
+                        self.stdout.write("\n".join(pending_output))
 
         mode = "DRY RUN" if dry_run else "COMMIT"
         self.stdout.write(
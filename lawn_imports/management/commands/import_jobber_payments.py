@@ -1,8 +1,11 @@
 import csv
+import re
 from decimal import Decimal
+from itertools import islice
 from pathlib import Path
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.utils import timezone
 from django.db.models import Sum
 
@@ -14,30 +17,50 @@ from forbes_lawn_billing.models import (
     PaymentMethod,
 )
 
+# Bound once so the per-row classifier doesn't re-resolve the enum members.
+_PM_CASH = PaymentMethod.CASH
+_PM_CHECK = PaymentMethod.CHECK
+_PM_CARD = PaymentMethod.CARD
+_PM_ACH = PaymentMethod.ACH
+_PM_OTHER = PaymentMethod.OTHER
+
+# Zero-width lookahead so overlapping needles (e.g. "ach" inside "bacheque") still
+# match at every position, same as the plain substring tests they replace.
+_PM_PAID_WITH_RE = re.compile(r"(?=(cash|check|cheque|credit|mastercard|card|visa|bank|ach))")
+_PM_TYPE_RE = re.compile(r"(?=(cash|check|bank payment|ach))")
+_PM_MAP = {
+    "cash": _PM_CASH,
+    "check": _PM_CHECK,
+    "cheque": _PM_CHECK,
+    "credit": _PM_CARD,
+    "card": _PM_CARD,
+    "visa": _PM_CARD,
+    "mastercard": _PM_CARD,
+    "bank": _PM_ACH,
+    "bank payment": _PM_ACH,
+    "ach": _PM_ACH,
+}
+_PM_PRIORITY = (_PM_CASH, _PM_CHECK, _PM_CARD, _PM_ACH)
+
+# Rows processed per transaction in the import loop.
+ROW_CHUNK_SIZE = 1000
+
 
 def map_jobber_payment_method(type_raw: str, paid_with_raw: str, paid_through_raw: str) -> str:
     """
     Map Jobber 'Type' / 'Paid with' / 'Paid through' text into our PaymentMethod enum.
     """
-    t = (type_raw or "").lower()
-    w = (paid_with_raw or "").lower()
-    thru = (paid_through_raw or "").lower()
+    # One regex scan per column; "Type" only carries the cash/check/bank signals.
+    hits = {_PM_MAP[m] for m in _PM_PAID_WITH_RE.findall((paid_with_raw or "").lower())}
+    hits.update(_PM_MAP[m] for m in _PM_TYPE_RE.findall((type_raw or "").lower()))
 
     # Most important signals first
-    if "cash" in w or "cash" in t:
-        return PaymentMethod.CASH
-
-    if "check" in w or "cheque" in w or "check" in t:
-        return PaymentMethod.CHECK
-
-    if "credit" in w or "card" in w or "visa" in w or "mastercard" in w:
-        return PaymentMethod.CARD
-
-    if "bank" in w or "ach" in w or "bank payment" in t or "ach" in t:
-        return PaymentMethod.ACH
+    for method in _PM_PRIORITY:
+        if method in hits:
+            return method
 
     # Fallback
-    return PaymentMethod.OTHER
+    return _PM_OTHER
 
 
 class Command(BaseCommand):
@@ -156,151 +179,177 @@ class Command(BaseCommand):
 
         created_payments = 0
         skipped_existing = 0
+        skipped_duplicates = 0
         invoices_touched = set()
+        # Payment rows (invoice, date, amount and every stored detail) already seen in this CSV
+        seen = set()
 
         with csv_path.open("r", newline="", encoding="utf-8-sig") as f:
             reader = csv.DictReader(f)
 
-            for row in reader:
-                # --- BASIC FIELDS ---
-                invoice_number = (row.get(COLUMN["invoice_number"]) or "").strip()
-                if not invoice_number:
-                    continue  # no invoice ref, nothing to attach
-
-                client_name = (row.get(COLUMN["client_name"]) or "").strip()
-                date_raw = row.get(COLUMN["date"]) or ""
-                payment_date = parse_date(date_raw)
-                if payment_date is None:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f"Skipping row for invoice #{invoice_number}: "
-                            f"could not parse date '{date_raw}'"
+            rows = iter(reader)
+            while True:
+                chunk = list(islice(rows, ROW_CHUNK_SIZE))
+                if not chunk:
+                    break
+
+                # One transaction per chunk instead of one implicit commit per query.
+                with transaction.atomic():
+                    for row in chunk:
+                        # --- BASIC FIELDS ---
+                        invoice_number = (row.get(COLUMN["invoice_number"]) or "").strip()
+                        if not invoice_number:
+                            continue  # no invoice ref, nothing to attach
+
+                        client_name = (row.get(COLUMN["client_name"]) or "").strip()
+                        date_raw = row.get(COLUMN["date"]) or ""
+                        payment_date = parse_date(date_raw)
+                        if payment_date is None:
+                            self.stdout.write(
+                                self.style.WARNING(
+                                    f"Skipping row for invoice #{invoice_number}: "
+                                    f"could not parse date '{date_raw}'"
+                                )
+                            )
+                            continue
+
+                        type_raw = (row.get(COLUMN["type"]) or "").strip()
+                        paid_with_raw = (row.get(COLUMN["paid_with"]) or "").strip()
+                        paid_through_raw = (row.get(COLUMN["paid_through"]) or "").strip()
+
+                        total_raw = row.get(COLUMN["total"]) or "0"
+                        raw_amount = parse_decimal(total_raw)
+                        amount = abs(raw_amount)  # Jobber exports negative for received money
+
+                        note = (row.get(COLUMN["note"]) or "").strip()
+                        card_last4 = (row.get(COLUMN["card_last4"]) or "").strip()
+                        card_type = (row.get(COLUMN["card_type"]) or "").strip()
+                        payout_id = (row.get(COLUMN["payout_id"]) or "").strip()
+
+                        # Jobber can export the same payment more than once (e.g. one row per
+                        # payout line item). Drop in-file duplicates before touching the DB.
+                        # The key holds every value written to the payment, so only rows that
+                        # would store exactly the same thing are skipped; a later row with a
+                        # different method or reference still updates the payment below.
+                        key = (
+                            invoice_number, payment_date, amount,
+                            type_raw, paid_with_raw, paid_through_raw,
+                            note, card_last4, card_type, payout_id,
                         )
-                    )
-                    continue
-
-                type_raw = (row.get(COLUMN["type"]) or "").strip()
-                paid_with_raw = (row.get(COLUMN["paid_with"]) or "").strip()
-                paid_through_raw = (row.get(COLUMN["paid_through"]) or "").strip()
-
-                total_raw = row.get(COLUMN["total"]) or "0"
-                raw_amount = parse_decimal(total_raw)
-                amount = abs(raw_amount)  # Jobber exports negative for received money
-
-                note = (row.get(COLUMN["note"]) or "").strip()
-                card_last4 = (row.get(COLUMN["card_last4"]) or "").strip()
-                card_type = (row.get(COLUMN["card_type"]) or "").strip()
-                payout_id = (row.get(COLUMN["payout_id"]) or "").strip()
-
-                # Determine payment method
-                payment_method = map_jobber_payment_method(
-                    type_raw,
-                    paid_with_raw,
-                    paid_through_raw,
-                )
-
-                # Lookup invoice by entity + invoice_number (which matches Jobber's Invoice #)
-                invoice = (
-                    Invoice.objects.filter(entity=entity, invoice_number=invoice_number)
-                    .order_by("-invoice_date")
-                    .first()
-                )
-                if invoice is None:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f"Invoice #{invoice_number} not found for payment row "
-                            f"(client={client_name}, amount={amount})."
+                        if key in seen:
+                            skipped_duplicates += 1
+                            continue
+                        seen.add(key)
+
+                        # Determine payment method
+                        payment_method = map_jobber_payment_method(
+                            type_raw,
+                            paid_with_raw,
+                            paid_through_raw,
                         )
-                    )
-                    continue
 
-                # Build a dedupe fingerprint: invoice + date + amount
-                lookup = {
-                    "invoice": invoice,
-                    "payment_date": payment_date,
-                    "amount": amount,
-                }
-
-                method_value = f"{paid_with_raw} via {paid_through_raw}".strip()
-
-                if dry_run:
-                    # Check if this payment already exists
-                    exists = InvoicePayment.objects.filter(**lookup).exists()
-                    if exists:
-                        skipped_existing += 1
-                        self.stdout.write(
-                            f"[DRY RUN] SKIP existing payment for invoice #{invoice_number} "
-                            f"on {payment_date} amount {amount}"
+                        # Lookup invoice by entity + invoice_number (which matches Jobber's Invoice #)
+                        invoice = (
+                            Invoice.objects.filter(entity=entity, invoice_number=invoice_number)
+                            .order_by("-invoice_date")
+                            .first()
                         )
-                    else:
-                        self.stdout.write(
-                            f"[DRY RUN] CREATE payment for invoice #{invoice_number} "
-                            f"on {payment_date} amount {amount} "
-                            f"method={payment_method} ({method_value})"
-                        )
-                    continue
-
-                # --- CREATE / UPDATE PAYMENT ---
-                payment, created = InvoicePayment.objects.get_or_create(
-                    **lookup,
-                    defaults={
-                        "payment_method": payment_method,
-                        "jobber_type": type_raw,
-                        "jobber_paid_with": paid_with_raw,
-                        "jobber_paid_through": paid_through_raw,
-                        "jobber_payment_id": payout_id,
-                        "reference": " | ".join([p for p in [
+                        if invoice is None:
+                            self.stdout.write(
+                                self.style.WARNING(
+                                    f"Invoice #{invoice_number} not found for payment row "
+                                    f"(client={client_name}, amount={amount})."
+                                )
+                            )
+                            continue
+
+                        # Build a dedupe fingerprint: invoice + date + amount
+                        lookup = {
+                            "invoice": invoice,
+                            "payment_date": payment_date,
+                            "amount": amount,
+                        }
+
+                        method_value = f"{paid_with_raw} via {paid_through_raw}".strip()
+
+                        if dry_run:
+                            # Check if this payment already exists
+                            exists = InvoicePayment.objects.filter(**lookup).exists()
+                            if exists:
+                                skipped_existing += 1
+                                self.stdout.write(
+                                    f"[DRY RUN] SKIP existing payment for invoice #{invoice_number} "
+                                    f"on {payment_date} amount {amount}"
+                                )
+                            else:
+                                self.stdout.write(
+                                    f"[DRY RUN] CREATE payment for invoice #{invoice_number} "
+                                    f"on {payment_date} amount {amount} "
+                                    f"method={payment_method} ({method_value})"
+                                )
+                            continue
+
+                        # --- CREATE / UPDATE PAYMENT ---
+                        # Built once, and only on the commit path.
+                        reference = " | ".join([p for p in [
                             note,
                             (f"{card_type} {card_last4}".strip() if (card_type or card_last4) else ""),
                             (f"Payout {payout_id}".strip() if payout_id else ""),
-                        ] if p]),
-                    },
-                    
-                )
-
-                if not created:
-                    # Update method & raw fields in case they changed or were defaulted to CASH before
-                    payment.payment_method = payment_method
-                    payment.jobber_type = type_raw
-                    payment.jobber_paid_with = paid_with_raw
-                    payment.jobber_paid_through = paid_through_raw
-                    #payment.note = note#
-                    payment.jobber_payment_id = payout_id
-                    payment.reference = " | ".join([p for p in [
-                        note,
-                        (f"{card_type} {card_last4}".strip() if (card_type or card_last4) else ""),
-                        (f"Payout {payout_id}".strip() if payout_id else ""),
-                    ] if p])
-                    payment.save()
-
-                if created:
-                    created_payments += 1
-                    invoices_touched.add(invoice.pk)
-                    self.stdout.write(
-                        f"[CREATE] Payment for invoice #{invoice_number} on {payment_date} "
-                        f"amount {amount} ({method_value})"
-                    )
-                else:
-                    skipped_existing += 1
-                    self.stdout.write(
-                        f"[SKIP] Existing payment for invoice #{invoice_number} "
-                        f"on {payment_date} amount {amount}"
-                    )
+                        ] if p])
+
+                        payment, created = InvoicePayment.objects.get_or_create(
+                            **lookup,
+                            defaults={
+                                "payment_method": payment_method,
+                                "jobber_type": type_raw,
+                                "jobber_paid_with": paid_with_raw,
+                                "jobber_paid_through": paid_through_raw,
+                                "jobber_payment_id": payout_id,
+                                "reference": reference,
+                            },
+                        )
+
+                        if not created:
+                            # Update method & raw fields in case they changed or were defaulted to CASH before
+                            payment.payment_method = payment_method
+                            payment.jobber_type = type_raw
+                            payment.jobber_paid_with = paid_with_raw
+                            payment.jobber_paid_through = paid_through_raw
+                            #payment.note = note#
+                            payment.jobber_payment_id = payout_id
+                            payment.reference = reference
+                            payment.save()
+
+                        if created:
+                            created_payments += 1
+                            invoices_touched.add(invoice.pk)
+                            self.stdout.write(
+                                f"[CREATE] Payment for invoice #{invoice_number} on {payment_date} "
+                                f"amount {amount} ({method_value})"
+                            )
+                        else:
+                            skipped_existing += 1
+                            self.stdout.write(
+                                f"[SKIP] Existing payment for invoice #{invoice_number} "
+                                f"on {payment_date} amount {amount}"
+                            )
 
         # After all payments, recompute invoice balances & status (non-dry-run only)
         if not dry_run and invoices_touched:
             self.stdout.write(self.style.NOTICE("Recomputing balances for touched invoices..."))
-            for invoice_id in invoices_touched:
-                try:
-                    inv = Invoice.objects.get(pk=invoice_id)
-                except Invoice.DoesNotExist:
-                    continue
-                recompute_invoice_payment_state(inv)
+            with transaction.atomic():
+                for invoice_id in invoices_touched:
+                    try:
+                        inv = Invoice.objects.get(pk=invoice_id)
+                    except Invoice.DoesNotExist:
+                        continue
+                    recompute_invoice_payment_state(inv)
 
         mode = "DRY RUN" if dry_run else "COMMIT"
         self.stdout.write(
             self.style.SUCCESS(
                 f"[{mode}] Payment import complete. "
-                f"Created {created_payments} payment(s), skipped {skipped_existing} existing."
+                f"Created {created_payments} payment(s), skipped {skipped_existing} existing, "
+                f"skipped {skipped_duplicates} duplicate row(s) in CSV."
             )
         )
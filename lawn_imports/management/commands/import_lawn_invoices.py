@@ -1,21 +1,150 @@
 # lawn_imports/management/commands/import_jobber_invoices.py
 
 import csv
+import functools
+import io
 import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime
 from decimal import Decimal
+from itertools import islice
 from pathlib import Path
+from typing import Optional
 
 from django.apps import apps
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.utils import timezone
 
 from django_ledger.models.entity import EntityModel
-from django_ledger.models import CustomerModel
 
 from forbes_lawn_billing.models import Invoice, InvoiceLine, InvoiceStatus
-from lawn_imports.utils import get_or_create_dl_customer_for_jobber
+from lawn_imports.utils import (
+    create_missing_dl_customers,
+    customer_cache_key,
+    get_or_create_dl_customer_for_jobber,
+    prefetch_dl_customers,
+)
+
+_MULTISPACE_RE = re.compile(r"\s+")
+_TRAIL_DASH_RE = re.compile(r"\s*-\s*$")
+_TAX_PCT_RE = re.compile(r"([\d.]+)\s*%")
+# "<name> (<qty>, $<rate>)" -> groups: name, qty, rate
+_LINE_ITEM_RE = re.compile(r"([^()]+?)\(\s*([\d.]+)\s*,\s*\$([\d.]+)\s*\)")
+_iter_line_items = _LINE_ITEM_RE.finditer
+# Same substring test as "tip" in name.lower(), without building the lowered copy.
+_TIP_SEARCH = re.compile("tip", re.IGNORECASE).search
+
+# Decimal is immutable, so per-row defaults can share these instances.
+_D0 = Decimal("0.00")
+_D1 = Decimal("1.0")
+_RATE0 = Decimal("0.0")
+_CENT = Decimal("0.01")
+# Strips "$" and thousands separators from money cells in one pass.
+_MONEY_TT = str.maketrans("", "", "$,")
+
+# Jobber date formats, most common first.
+_DATE_FORMATS = ("%b %d, %Y", "%d-%b-%y")
+_strptime = datetime.strptime
+
+# One parsed entry from Jobber's "Line items" column.
+LineItem = namedtuple("LineItem", "name qty rate taxable")
+
+# CSV rows per savepoint in the import loop.
+ROW_CHUNK_SIZE = 500
+
+# Invoice columns the importer overwrites on an existing invoice.
+INVOICE_IMPORT_FIELDS = [
+    "customer",
+    "invoice_number",
+    "customer_name",
+    "email_to",
+    "bill_to_name",
+    "bill_to_line1",
+    "bill_to_city",
+    "bill_to_state",
+    "bill_to_zip",
+    "invoice_date",
+    "due_date",
+    "status",
+    "discount_amount",
+    "deposit_amount",
+    "tax_rate_percent",
+    "subtotal",
+    "tax_amount",
+    "total",
+    "balance_due",
+    "amount_paid",
+    "paid_in_full",
+    "updated_at",
+]
+
+# InvoiceLine columns rewritten when a stored line differs from the CSV.
+INVOICE_LINE_IMPORT_FIELDS = [
+    "item_model",
+    "item_name",
+    "description",
+    "quantity",
+    "rate",
+    "taxable",
+    "line_amount",
+]
+
+# Jobber exports can run to several MB; read them in 1 MiB blocks.
+_CSV_BUFFER_SIZE = 1 << 20
+_UTF8_BOM = b"\xef\xbb\xbf"
+
+
+def _open_csv(csv_path):
+    """
+    Open a CSV for reading with a large buffer.
+    Returns (text_file, data_start) where data_start is the offset just past
+    any UTF-8 BOM, for rewinding between passes.
+    """
+    raw = open(csv_path, "rb", buffering=_CSV_BUFFER_SIZE)
+    data_start = len(_UTF8_BOM) if raw.read(len(_UTF8_BOM)) == _UTF8_BOM else 0
+    raw.seek(data_start)
+    return io.TextIOWrapper(raw, encoding="utf-8", newline=""), data_start
+
+
+def _chunked(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_decimal(value: str) -> Decimal:
+    if value is None:
+        return _D0
+    v = value.strip()
+    if not v:
+        return _D0
+    return Decimal(v.translate(_MONEY_TT))
+
+
+def parse_date(value: str):
+    """
+    Jobber actual format: 'Nov 19, 2025'
+    """
+    if not value:
+        return None
+    v = value.strip()
+    if not v or v == "-":
+        return None
+    for fmt in _DATE_FORMATS:
+        try:
+            return _strptime(v, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date format: {value}")
 
 
+@functools.lru_cache(maxsize=256)
 def normalize_service_name(name: str) -> str:
     """
     Normalize Jobber/DB service names so they match ItemModel.name reliably.
@@ -26,11 +155,201 @@ def normalize_service_name(name: str) -> str:
     """
     s = (name or "").strip()
     s = s.lstrip(",").strip()
-    s = re.sub(r"\s+", " ", s)
-    s = re.sub(r"\s*-\s*$", "", s)
+    s = _MULTISPACE_RE.sub(" ", s)
+    s = _TRAIL_DASH_RE.sub("", s)
     return s.strip()
 
 
+@functools.lru_cache(maxsize=256)
+def parse_tax_rate_percent(value: str) -> Decimal:
+    """
+    e.g. "KS-Johnson-Prairie Village (8.975%)" -> Decimal("8.975")
+    or "-" or "" -> Decimal("0.0")
+    """
+    if not value:
+        return _RATE0
+    m = _TAX_PCT_RE.search(value)
+    if m:
+        return Decimal(m.group(1))
+    return _RATE0
+
+
+@functools.lru_cache(maxsize=256)
+def parse_status(raw_status: str) -> str:
+    if not raw_status:
+        return InvoiceStatus.DRAFT
+    s = raw_status.strip().lower()
+    if "paid" in s:
+        return InvoiceStatus.PAID
+    if "draft" in s:
+        return InvoiceStatus.DRAFT
+    if "void" in s or "canceled" in s:
+        return InvoiceStatus.VOID
+    return InvoiceStatus.OPEN
+
+
+def parse_line_items(text: str, tax_rate_percent: Decimal, subtotal: Decimal):
+    """
+    Parse Jobber's 'Line items' column into a list of LineItem tuples.
+
+    Keeps splits exactly as Jobber lists them.
+    Ignores zero-dollar lines (e.g. Tip (1, $0)).
+    Normalizes service names so ItemModel lookup works (Aeration dash issue).
+    """
+    items = []
+    if not text:
+        return items
+
+    taxable_flag = tax_rate_percent > 0
+
+    # Every itemized entry has "(qty, $rate)"; without a "(" only the
+    # single-line subtotal fallback below can apply.
+    if "(" not in text:
+        if subtotal:
+            items.append(LineItem(normalize_service_name(text.strip()) or "Service", _D1, subtotal, taxable_flag))
+        return items
+
+    for m in _iter_line_items(text):
+        raw_name, qty_raw, rate_raw = m.groups()
+        name = normalize_service_name(raw_name).rstrip(",")
+
+        qty = Decimal(qty_raw)
+        rate = Decimal(rate_raw)
+
+        if rate == 0:
+            continue
+
+        if _TIP_SEARCH(name):
+            name = "Tip"
+
+        items.append(LineItem(name or "Service", qty, rate, taxable_flag))
+
+    if not items and subtotal:
+        items.append(
+            LineItem(normalize_service_name(text.strip()) or "Service", _D1, subtotal, taxable_flag)
+        )
+
+    return items
+
+
+COLUMN = {
+    "invoice_number": "Invoice #",
+    "customer_name": "Client name",
+    "client_email": "Client email",
+    "client_phone": "Client phone",
+    "bill_to_line1": "Billing street",
+    "bill_to_city": "Billing city",
+    "bill_to_state": "Billing province",
+    "bill_to_zip": "Billing ZIP",
+    "invoice_date": "Created date",
+    "issued_date": "Issued date",
+    "due_date": "Due date",
+    "status": "Status",
+    "line_items": "Line items",
+    "subtotal": "Pre-tax total ($)",
+    "total": "Total ($)",
+    "tip": "Tip ($)",
+    "balance": "Balance ($)",
+    "tax_percent": "Tax (%)",
+    "deposit": "Deposit $",
+    "discount": "Discount ($)",
+    "tax_amount": "Tax amount ($)",
+}
+# Money columns parsed together per row, in ParsedRow field order.
+_MONEY_COLUMNS = tuple(
+    COLUMN[k] for k in ("subtotal", "total", "balance", "deposit", "discount", "tax_amount", "tip")
+)
+
+
+@dataclass
+class ParsedRow:
+    """One Jobber invoice CSV row with every cell parsed; no DB access needed."""
+
+    invoice_number: str
+    customer_name: str
+    client_email: str
+    client_phone: str
+    bill_to_line1: str
+    bill_to_city: str
+    bill_to_state: str
+    bill_to_zip: str
+    invoice_date: Optional[date]
+    due_date: Optional[date]
+    status: str
+    subtotal: Decimal
+    total: Decimal
+    balance: Decimal
+    deposit: Decimal
+    discount: Decimal
+    tax_amount: Decimal
+    tip: Decimal
+    tax_rate_percent: Decimal
+    raw_line_items_text: str
+    line_items: list
+
+
+def parse_row(row: dict) -> Optional[ParsedRow]:
+    """
+    Parse a csv.DictReader row. Returns None for rows without an invoice number.
+    """
+    invoice_number = (row.get(COLUMN["invoice_number"]) or "").strip()
+    if not invoice_number:
+        return None
+
+    subtotal, total, balance, deposit, discount, tax_amount, tip = map(
+        parse_decimal, map(row.get, _MONEY_COLUMNS)
+    )
+    tax_rate_percent = parse_tax_rate_percent(row.get(COLUMN["tax_percent"]))
+    raw_line_items_text = row.get(COLUMN["line_items"]) or ""
+
+    return ParsedRow(
+        invoice_number=invoice_number,
+        customer_name=(row.get(COLUMN["customer_name"]) or "").strip(),
+        client_email=(row.get(COLUMN["client_email"]) or "").strip(),
+        client_phone=(row.get(COLUMN["client_phone"]) or "").strip(),
+        bill_to_line1=(row.get(COLUMN["bill_to_line1"]) or "").strip(),
+        bill_to_city=(row.get(COLUMN["bill_to_city"]) or "").strip(),
+        bill_to_state=(row.get(COLUMN["bill_to_state"]) or "").strip(),
+        bill_to_zip=(row.get(COLUMN["bill_to_zip"]) or "").strip(),
+        invoice_date=parse_date(row.get(COLUMN["invoice_date"])),
+        due_date=parse_date(row.get(COLUMN["due_date"])),
+        status=parse_status((row.get(COLUMN["status"]) or "").strip()),
+        subtotal=subtotal,
+        total=total,
+        balance=balance,
+        deposit=deposit,
+        discount=discount,
+        tax_amount=tax_amount,
+        tip=tip,
+        tax_rate_percent=tax_rate_percent,
+        raw_line_items_text=raw_line_items_text,
+        line_items=parse_line_items(raw_line_items_text, tax_rate_percent, subtotal),
+    )
+
+
+def _parse_chunk(rows):
+    return [parsed for parsed in map(parse_row, rows) if parsed is not None]
+
+
+def _parsed_chunks(reader):
+    """
+    Yield lists of ParsedRow, one per ROW_CHUNK_SIZE rows.
+
+    The next chunk is parsed on a worker thread while the caller writes the
+    current one; the GIL is released while waiting on the database, so the
+    parsing overlaps with the writes.
+    """
+    chunks = _chunked(reader, ROW_CHUNK_SIZE)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        chunk = next(chunks, None)
+        future = pool.submit(_parse_chunk, chunk) if chunk is not None else None
+        while future is not None:
+            parsed = future.result()
+            chunk = next(chunks, None)
+            future = pool.submit(_parse_chunk, chunk) if chunk is not None else None
+            yield parsed
+
+
 class Command(BaseCommand):
     help = "Import Jobber invoice CSV into Forbes Lawn Invoice/InvoiceLine models."
 
@@ -53,6 +372,14 @@ class Command(BaseCommand):
         csv_path = Path(options["csv_path"])
         entity_name = options["entity"]
         dry_run = options["dry_run"]
+        verbose = options["verbosity"] >= 2
+
+        # Per-row styling is skipped entirely when output isn't a terminal
+        # (redirected to a file, or captured via call_command(stdout=...)).
+        if self.stdout.isatty():
+            style_notice, style_warning = self.style.NOTICE, self.style.WARNING
+        else:
+            style_notice = style_warning = str
 
         if not csv_path.exists():
             raise CommandError(f"CSV file not found: {csv_path}")
@@ -68,294 +395,280 @@ class Command(BaseCommand):
 
         ItemModel = apps.get_model("django_ledger", "ItemModel")
 
-        COLUMN = {
-            "invoice_number": "Invoice #",
-            "customer_name": "Client name",
-            "client_email": "Client email",
-            "client_phone": "Client phone",
-            "bill_to_line1": "Billing street",
-            "bill_to_city": "Billing city",
-            "bill_to_state": "Billing province",
-            "bill_to_zip": "Billing ZIP",
-            "invoice_date": "Created date",
-            "issued_date": "Issued date",
-            "due_date": "Due date",
-            "status": "Status",
-            "line_items": "Line items",
-            "subtotal": "Pre-tax total ($)",
-            "total": "Total ($)",
-            "tip": "Tip ($)",
-            "balance": "Balance ($)",
-            "tax_percent": "Tax (%)",
-            "deposit": "Deposit $",
-            "discount": "Discount ($)",
-            "tax_amount": "Tax amount ($)",
-        }
-
-        def parse_decimal(value: str) -> Decimal:
-            if value is None:
-                return Decimal("0.00")
-            v = value.strip()
-            if not v:
-                return Decimal("0.00")
-            v = v.replace("$", "").replace(",", "")
-            return Decimal(v)
-
-        def parse_date(value: str):
-            """
-            Jobber actual format: 'Nov 19, 2025'
-            """
-            if not value:
-                return None
-            v = value.strip()
-            if not v or v == "-":
-                return None
-            try:
-                return timezone.datetime.strptime(v, "%b %d, %Y").date()
-            except ValueError:
-                try:
-                    return timezone.datetime.strptime(v, "%d-%b-%y").date()
-                except ValueError:
-                    raise ValueError(f"Unrecognized date format: {value}")
-
-        def parse_tax_rate_percent(value: str) -> Decimal:
-            """
-            e.g. "KS-Johnson-Prairie Village (8.975%)" -> Decimal("8.975")
-            or "-" or "" -> Decimal("0.0")
-            """
-            if not value:
-                return Decimal("0.0")
-            m = re.search(r"([\d.]+)\s*%", value)
-            if m:
-                return Decimal(m.group(1))
-            return Decimal("0.0")
-
-        def parse_status(raw_status: str) -> str:
-            if not raw_status:
-                return InvoiceStatus.DRAFT
-            s = raw_status.strip().lower()
-            if "paid" in s:
-                return InvoiceStatus.PAID
-            if "draft" in s:
-                return InvoiceStatus.DRAFT
-            if "void" in s or "canceled" in s:
-                return InvoiceStatus.VOID
-            return InvoiceStatus.OPEN
-
-        def parse_line_items(text: str, tax_rate_percent: Decimal, subtotal: Decimal):
-            """
-            Parse Jobber's 'Line items' column into a list of dicts.
-
-            Keeps splits exactly as Jobber lists them.
-            Ignores zero-dollar lines (e.g. Tip (1, $0)).
-            Normalizes service names so ItemModel lookup works (Aeration dash issue).
-            """
-            items = []
-            if not text:
-                return items
-
-            taxable_flag = tax_rate_percent > 0
-
-            pattern = re.compile(
-                r"""
-                (?P<name>[^()]+?)        # text up to '(' (no parentheses)
-                \(\s*
-                (?P<qty>[\d.]+)          # quantity
-                \s*,\s*\$
-                (?P<rate>[\d.]+)         # rate
-                \s*\)
-                """,
-                re.VERBOSE,
-            )
-
-            for m in pattern.finditer(text):
-                raw_name = m.group("name")
-                name = normalize_service_name(raw_name).rstrip(",")
-
-                qty = Decimal(m.group("qty"))
-                rate = Decimal(m.group("rate"))
-
-                if rate == 0:
-                    continue
-
-                if "tip" in name.lower():
-                    name = "Tip"
-
-                items.append({"name": name or "Service", "qty": qty, "rate": rate, "taxable": taxable_flag})
-
-            if not items and subtotal:
-                items.append(
-                    {"name": normalize_service_name(text.strip()) or "Service", "qty": Decimal("1.0"), "rate": subtotal, "taxable": taxable_flag}
-                )
-
-            return items
-
         created_invoices = 0
         updated_invoices = 0
         created_lines = 0
-
-        with csv_path.open("r", newline="", encoding="utf-8-sig") as f:
-            reader = csv.DictReader(f)
-
-            for row in reader:
+        updated_lines = 0
+
+        f, data_start = _open_csv(csv_path)
+        with f:
+            # Pass 1: collect lookup keys so the DB is hit with a few bulk queries
+            # instead of several queries per row.
+            invoice_numbers = set()
+            customer_names = set()
+            customer_rows = []
+            for row in csv.DictReader(f):
                 invoice_number = (row.get(COLUMN["invoice_number"]) or "").strip()
                 if not invoice_number:
                     continue
-
+                invoice_numbers.add(invoice_number)
                 customer_name = (row.get(COLUMN["customer_name"]) or "").strip()
-                client_email = (row.get(COLUMN["client_email"]) or "").strip()
-                client_phone = (row.get(COLUMN["client_phone"]) or "").strip()
-
-                bill_to_line1 = (row.get(COLUMN["bill_to_line1"]) or "").strip()
-                bill_to_city = (row.get(COLUMN["bill_to_city"]) or "").strip()
-                bill_to_state = (row.get(COLUMN["bill_to_state"]) or "").strip()
-                bill_to_zip = (row.get(COLUMN["bill_to_zip"]) or "").strip()
-
-                invoice_date = parse_date(row.get(COLUMN["invoice_date"]))
-                due_date = parse_date(row.get(COLUMN["due_date"]))
-                status_raw = (row.get(COLUMN["status"]) or "").strip()
-                status = parse_status(status_raw)
-
-                subtotal_csv = parse_decimal(row.get(COLUMN["subtotal"]))
-                total_csv = parse_decimal(row.get(COLUMN["total"]))
-                balance_csv = parse_decimal(row.get(COLUMN["balance"]))
-                deposit_csv = parse_decimal(row.get(COLUMN["deposit"]))
-                discount_csv = parse_decimal(row.get(COLUMN["discount"]))
-                tax_amount_csv = parse_decimal(row.get(COLUMN["tax_amount"]))
-                tax_rate_percent = parse_tax_rate_percent(row.get(COLUMN["tax_percent"]))
-                tip_amount_csv = parse_decimal(row.get(COLUMN["tip"]))
-
-                raw_line_items_text = row.get(COLUMN["line_items"]) or ""
-                line_items = parse_line_items(raw_line_items_text, tax_rate_percent, subtotal_csv)
-
-                self.stdout.write(
-                    self.style.NOTICE(
-                        f"[DEBUG] invoice #{invoice_number} raw_line_items={raw_line_items_text!r} -> parsed={line_items!r}"
-                    )
-                )
-
-                customer_action_label = "N/A"
-                dl_customer = None
-                created_customer = False
+                customer_names.add(customer_name)
+                customer_rows.append((
+                    customer_name,
+                    (row.get(COLUMN["client_email"]) or "").strip(),
+                    (row.get(COLUMN["client_phone"]) or "").strip(),
+                ))
+
+            # Querysets keep their default ordering, so setdefault() keeps the
+            # same row the old per-row .first() lookups returned.
+            invoices_by_jid = {}
+            # Only the columns that are read back are loaded; everything else is
+            # overwritten from the CSV before the invoice is saved.
+            invoice_qs = Invoice.objects.filter(entity=entity, jobber_invoice_id__in=invoice_numbers).only(
+                "id", "jobber_invoice_id", "invoice_date", "due_date", "customer_id"
+            )
+            for inv in invoice_qs:
+                invoices_by_jid.setdefault(inv.jobber_invoice_id, inv)
+
+            customer_cache = {}
+            prefetch_dl_customers(entity, customer_names, customer_cache)
+
+            # New customers are created here, each committed on its own, rather
+            # than inside the import-wide transaction below, so the per-customer
+            # creation lock isn't held for the whole import.
+            new_customer_pks = set()
+            if not dry_run:
+                new_customer_pks = create_missing_dl_customers(entity, customer_rows, customer_cache)
+            del customer_rows
+
+            # Case-fold item names once in Python; a name__iexact filter per line
+            # can't use the plain b-tree index on name.
+            # ItemModel's manager select_related()s uom, which only() can't
+            # defer, so that join is dropped first.
+            items_by_lower = {}
+            if not dry_run:
+                for item in ItemModel.objects.filter(entity=entity).select_related(None).only("name"):
+                    items_by_lower.setdefault(item.name.lower(), item)
+
+            # Pass 2: process rows using the in-memory lookups.
+            f.seek(data_start)
+            reader = csv.DictReader(f)
 
-                if dry_run:
-                    qs = CustomerModel.objects.filter(entity_model=entity, customer_name=customer_name)
-                    if client_email:
-                        qs = qs.filter(email__iexact=client_email)
-
-                    customer_action_label = "EXISTING CUSTOMER" if qs.exists() else "WOULD CREATE CUSTOMER"
-                else:
-                    dl_customer, created_customer = get_or_create_dl_customer_for_jobber(
-                        entity=entity,
-                        client_name=customer_name,
-                        client_email=client_email,
-                        client_phone=client_phone,
-                    )
-                    customer_action_label = "NEW CUSTOMER" if created_customer else "EXISTING CUSTOMER"
-
-                jobber_invoice_id = invoice_number
-
-                invoice = Invoice.objects.filter(entity=entity, jobber_invoice_id=jobber_invoice_id).first()
-
-                created = False
-                if invoice is None:
-                    invoice = Invoice(entity=entity, jobber_invoice_id=jobber_invoice_id)
-                    created = True
-
-                if not dry_run:
-                    invoice.customer = dl_customer
-
-                invoice.invoice_number = invoice_number
-                invoice.customer_name = customer_name
-                invoice.email_to = client_email
-
-                invoice.bill_to_name = customer_name
-                invoice.bill_to_line1 = bill_to_line1
-                invoice.bill_to_city = bill_to_city
-                invoice.bill_to_state = bill_to_state
-                invoice.bill_to_zip = bill_to_zip
-
-                invoice.invoice_date = invoice_date or invoice.invoice_date or timezone.localdate()
-                invoice.due_date = due_date or invoice.due_date
-                invoice.status = status
-
-                invoice.discount_amount = discount_csv
-                invoice.deposit_amount = deposit_csv
-                invoice.tax_rate_percent = tax_rate_percent
+            # One transaction for the whole import, with a savepoint per chunk.
+            # Dry runs go through the same path and are rolled back at the end.
+            with transaction.atomic():
+                for parsed_chunk in _parsed_chunks(reader):
+                    # Per-row output is buffered and written once per chunk.
+                    pending_output = []
+                    with transaction.atomic():
+                        for parsed in parsed_chunk:
+                            invoice_number = parsed.invoice_number
+                            customer_name = parsed.customer_name
+                            client_email = parsed.client_email
+                            client_phone = parsed.client_phone
+
+                            bill_to_line1 = parsed.bill_to_line1
+                            bill_to_city = parsed.bill_to_city
+                            bill_to_state = parsed.bill_to_state
+                            bill_to_zip = parsed.bill_to_zip
+
+                            invoice_date = parsed.invoice_date
+                            due_date = parsed.due_date
+                            status = parsed.status
+
+                            subtotal_csv = parsed.subtotal
+                            total_csv = parsed.total
+                            balance_csv = parsed.balance
+                            deposit_csv = parsed.deposit
+                            discount_csv = parsed.discount
+                            tax_amount_csv = parsed.tax_amount
+                            tip_amount_csv = parsed.tip
+                            tax_rate_percent = parsed.tax_rate_percent
+
+                            raw_line_items_text = parsed.raw_line_items_text
+                            line_items = parsed.line_items
+
+                            if verbose:
+                                pending_output.append(
+                                    style_notice(
+                                        f"[DEBUG] invoice #{invoice_number} raw_line_items={raw_line_items_text!r} -> parsed={line_items!r}"
+                                    )
+                                )
+
+                            customer_action_label = "N/A"
+                            dl_customer = None
+                            created_customer = False
+
+                            dl_customer = customer_cache.get(customer_cache_key(customer_name, client_email))
+
+                            if dry_run:
+                                customer_action_label = "EXISTING CUSTOMER" if dl_customer else "WOULD CREATE CUSTOMER"
+                            elif dl_customer is not None:
+                                if dl_customer.pk in new_customer_pks:
+                                    # Created up front for this row; report it as before.
+                                    new_customer_pks.discard(dl_customer.pk)
+                                    created_customer = True
+                                    customer_action_label = "NEW CUSTOMER"
+                                else:
+                                    customer_action_label = "EXISTING CUSTOMER"
+                            else:
+                                dl_customer, created_customer = get_or_create_dl_customer_for_jobber(
+                                    entity=entity,
+                                    client_name=customer_name,
+                                    client_email=client_email,
+                                    client_phone=client_phone,
+                                    cache=customer_cache,
+                                )
+                                customer_action_label = "NEW CUSTOMER" if created_customer else "EXISTING CUSTOMER"
+
+                            jobber_invoice_id = invoice_number
+
+                            invoice = invoices_by_jid.get(jobber_invoice_id)
+
+                            created = False
+                            if invoice is None:
+                                invoice = Invoice(entity=entity, jobber_invoice_id=jobber_invoice_id)
+                                created = True
+
+                            if not dry_run:
+                                invoice.customer = dl_customer
+
+                            invoice.invoice_number = invoice_number
+                            invoice.customer_name = customer_name
+                            invoice.email_to = client_email
+
+                            invoice.bill_to_name = customer_name
+                            invoice.bill_to_line1 = bill_to_line1
+                            invoice.bill_to_city = bill_to_city
+                            invoice.bill_to_state = bill_to_state
+                            invoice.bill_to_zip = bill_to_zip
+
+                            invoice.invoice_date = invoice_date or invoice.invoice_date or timezone.localdate()
+                            invoice.due_date = due_date or invoice.due_date
+                            invoice.status = status
+
+                            invoice.discount_amount = discount_csv
+                            invoice.deposit_amount = deposit_csv
+                            invoice.tax_rate_percent = tax_rate_percent
+
+                            if dry_run:
+                                action = "CREATE" if created else "UPDATE"
+                                pending_output.append(
+                                    f"[DRY RUN] {action} invoice #{invoice_number} for {customer_name} "
+                                    f"({customer_action_label}, subtotal={subtotal_csv}, total={total_csv}, tax%={tax_rate_percent}, tip={tip_amount_csv})"
+                                )
+                                continue
+
+                            # Trust Jobber totals
+                            invoice.subtotal = subtotal_csv
+                            invoice.tax_amount = tax_amount_csv
+                            invoice.total = total_csv
+
+                            invoice.balance_due = balance_csv
+                            invoice.amount_paid = (invoice.total or _D0) - invoice.balance_due
+
+                            if invoice.balance_due <= _D0:
+                                invoice.status = InvoiceStatus.PAID
+                                invoice.paid_in_full = True
+                            elif invoice.amount_paid > _D0:
+                                invoice.status = InvoiceStatus.PARTIALLY_PAID
+                                invoice.paid_in_full = False
+                            else:
+                                invoice.status = InvoiceStatus.OPEN
+                                invoice.paid_in_full = False
+
+                            # Exactly one write per invoice: INSERT when new, narrow UPDATE otherwise.
+                            if created:
+                                invoice.save()
+                                invoices_by_jid[jobber_invoice_id] = invoice
+                            else:
+                                invoice.save(update_fields=INVOICE_IMPORT_FIELDS)
+
+                            # Diff against the stored lines (keyed by line_number) so a
+                            # re-import only writes the lines that actually changed.
+                            existing_lines = {}
+                            stale_line_pks = []
+                            if not created:
+                                for old_line in invoice.lines.all():
+                                    if old_line.line_number in existing_lines:
+                                        stale_line_pks.append(old_line.pk)
+                                    else:
+                                        existing_lines[old_line.line_number] = old_line
+
+                            new_lines = []
+                            changed_lines = []
+                            line_number = 1
+                            for li in line_items:
+                                item_name = normalize_service_name(li.name)
+
+                                item_model = items_by_lower.get(item_name.lower())
+                                if item_model is None:
+                                    pending_output.append(style_warning(
+                                        f"[DEBUG] No ItemModel found. item_name={item_name!r} (entity={entity.slug})"
+                                    ))
+
+                                item_model_id = item_model.pk if item_model is not None else None
+                                line = existing_lines.pop(line_number, None)
+                                if line is None:
+                                    line = InvoiceLine(
+                                        invoice=invoice,
+                                        line_number=line_number,
+                                        item_model=item_model,
+                                        item_name=item_name,
+                                        description="",
+                                        quantity=li.qty,
+                                        rate=li.rate,
+                                        taxable=li.taxable,
+                                        line_amount=(li.qty * li.rate).quantize(_CENT),
+                                    )
+                                    new_lines.append(line)
+                                elif (
+                                    line.item_model_id,
+                                    line.item_name,
+                                    line.description,
+                                    line.quantity,
+                                    line.rate,
+                                    line.taxable,
+                                ) != (item_model_id, item_name, "", li.qty, li.rate, li.taxable):
+                                    line.item_model = item_model
+                                    line.item_name = item_name
+                                    line.description = ""
+                                    line.quantity = li.qty
+                                    line.rate = li.rate
+                                    line.taxable = li.taxable
+                                    line.line_amount = (li.qty * li.rate).quantize(_CENT)
+                                    changed_lines.append(line)
+                                line_number += 1
+
+                            stale_line_pks.extend(old_line.pk for old_line in existing_lines.values())
+                            if stale_line_pks:
+                                InvoiceLine.objects.filter(pk__in=stale_line_pks).delete()
+                            if changed_lines:
+                                InvoiceLine.objects.bulk_update(changed_lines, INVOICE_LINE_IMPORT_FIELDS, batch_size=500)
+                                updated_lines += len(changed_lines)
+                            InvoiceLine.objects.bulk_create(new_lines, batch_size=500)
+                            created_lines += len(new_lines)
+
+                            if created:
+                                created_invoices += 1
+                                action = "CREATED"
+                            else:
+                                updated_invoices += 1
+                                action = "UPDATED"
+
+                            pending_output.append(f"[{action}] Invoice {invoice.invoice_number} ({customer_name}) [{customer_action_label}]")
+
+                    if pending_output:
+                        self.stdout.write("\n".join(pending_output))
 
                 if dry_run:
-                    action = "CREATE" if created else "UPDATE"
-                    self.stdout.write(
-                        f"[DRY RUN] {action} invoice #{invoice_number} for {customer_name} "
-                        f"({customer_action_label}, subtotal={subtotal_csv}, total={total_csv}, tax%={tax_rate_percent}, tip={tip_amount_csv})"
-                    )
-                    continue
-
-                invoice.save()
-
-                if created:
-                    created_invoices += 1
-                    action = "CREATED"
-                else:
-                    updated_invoices += 1
-                    action = "UPDATED"
-
-                self.stdout.write(f"[{action}] Invoice {invoice.invoice_number} ({customer_name}) [{customer_action_label}]")
-
-                invoice.lines.all().delete()
-
-                line_number = 1
-                for li in line_items:
-                    item_name = normalize_service_name(li["name"])
-
-                    item_model = ItemModel.objects.filter(entity=entity, name__iexact=item_name).first()
-                    if item_model is None:
-                        self.stdout.write(self.style.WARNING(
-                            f"[DEBUG] No ItemModel found. item_name={item_name!r} (entity={entity.slug})"
-                        ))
-
-                    line = InvoiceLine(
-                        invoice=invoice,
-                        line_number=line_number,
-                        item_model=item_model,
-                        item_name=item_name,
-                        description="",
-                        quantity=li["qty"],
-                        rate=li["rate"],
-                        taxable=li["taxable"],
-                    )
-                    line.recompute_amount()
-                    line.save()
-                    created_lines += 1
-                    line_number += 1
-
-                # Trust Jobber totals
-                invoice.subtotal = subtotal_csv
-                invoice.tax_amount = tax_amount_csv
-                invoice.total = total_csv
-                invoice.tax_rate_percent = tax_rate_percent
-                invoice.discount_amount = discount_csv
-                invoice.deposit_amount = deposit_csv
-
-                invoice.balance_due = balance_csv
-                invoice.amount_paid = (invoice.total or Decimal("0.00")) - invoice.balance_due
-
-                if invoice.balance_due <= Decimal("0.00"):
-                    invoice.status = InvoiceStatus.PAID
-                    invoice.paid_in_full = True
-                elif invoice.amount_paid > Decimal("0.00"):
-                    invoice.status = InvoiceStatus.PARTIALLY_PAID
-                    invoice.paid_in_full = False
-                else:
-                    invoice.status = InvoiceStatus.OPEN
-                    invoice.paid_in_full = False
-
-                invoice.save()
+                    transaction.set_rollback(True)
 
         mode = "DRY RUN" if dry_run else "COMMIT"
         self.stdout.write(
             self.style.SUCCESS(
                 f"[{mode}] Finished reading CSV. "
-                f"Invoices created/updated (not counted in dry-run): created={created_invoices}, updated={updated_invoices}, lines_created={created_lines}"
+                f"Invoices created/updated (not counted in dry-run): created={created_invoices}, updated={updated_invoices}, lines_created={created_lines}, lines_updated={updated_lines}"
             )
         )
@@ -1,21 +1,55 @@
 # lawn_imports/utils.py
 
-from typing import Optional, Tuple
+from typing import Iterable, Optional, Set, Tuple
+
+from django.db import connection, transaction
 
 from django_ledger.models import EntityModel, CustomerModel
 
 
+def customer_cache_key(client_name: str, client_email: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """
+    Key for a customer cache dict, following the helper's match rules:
+    (name, lowercased email) when the row has an email, else (name, None).
+    """
+    email = (client_email or "").strip()
+    return (client_name or "").strip(), (email.lower() or None)
+
+
+def prefetch_dl_customers(entity: EntityModel, customer_names, cache: dict) -> None:
+    """
+    Load this entity's customers named in customer_names into cache with one
+    query. The first customer per key (by pk) wins, like qs.first().
+    """
+    customers = CustomerModel.objects.filter(
+        entity_model=entity,
+        customer_name__in=customer_names,
+    ).only("customer_name", "email").order_by("pk")
+    # Keys use the stored values as-is, since the helper's queries match
+    # customer_name exactly and email case-insensitively (no trimming).
+    for c in customers:
+        cache.setdefault((c.customer_name, None), c)
+        if c.email:
+            cache.setdefault((c.customer_name, c.email.lower()), c)
+
+
 def get_or_create_dl_customer_for_jobber(
     entity: EntityModel,
     client_name: str,
     client_email: Optional[str] = None,
     client_phone: Optional[str] = None,
+    cache: Optional[dict] = None,
 ) -> Tuple[CustomerModel, bool]:
     """
     Resolve a Django Ledger CustomerModel for a given Jobber client row.
 
     - First tries to match by entity + customer_name (and email when provided).
-    - If not found, creates a new CustomerModel under this entity.
+    - If not found, creates a new CustomerModel under this entity. A lock on
+      (entity, name) is taken and the match re-checked first, so two
+      concurrent imports can't both create the same customer.
+
+    When a cache dict is passed (see prefetch_dl_customers), it is checked
+    before the database and updated with whatever customer is resolved.
 
     Returns (customer, created_flag).
     """
@@ -25,26 +59,97 @@ def get_or_create_dl_customer_for_jobber(
     if not name:
         raise ValueError("Jobber row is missing client name; cannot create CustomerModel.")
 
+    if cache is not None:
+        customer = cache.get(customer_cache_key(name, email))
+        if customer is not None:
+            return customer, False
+
+    customer, created = _get_or_create_dl_customer(entity, name, email, client_phone)
+
+    if cache is not None:
+        cache.setdefault(customer_cache_key(name), customer)
+        if email:
+            cache.setdefault(customer_cache_key(name, email), customer)
+
+    return customer, created
+
+
+def _get_or_create_dl_customer(
+    entity: EntityModel,
+    name: str,
+    email: Optional[str],
+    client_phone: Optional[str],
+) -> Tuple[CustomerModel, bool]:
     qs = CustomerModel.objects.filter(
         entity_model=entity,
         customer_name=name,
-    )
+    ).only("customer_name", "email")
 
     # If email is present, narrow by email as well (case insensitive)
     if email:
         qs = qs.filter(email__iexact=email)
 
     customer = qs.first()
-    created = False
+    if customer:
+        return customer, False
+
+    with transaction.atomic():
+        _lock_customer_name(entity, name)
+        customer = qs.first()
+        if customer:
+            return customer, False
 
-    if not customer:
         customer = CustomerModel.objects.create(
             entity_model=entity,
             customer_name=name,
             email=email,
             phone=client_phone,
         )
-        created = True
 
-    return customer, created
+    return customer, True
+
+
+
+def _lock_customer_name(entity: EntityModel, name: str) -> None:
+    """
+    Serialize customer creation for one (entity, name) until the surrounding
+    transaction ends. A transaction-level advisory lock only blocks another
+    creator of the same customer; locking the entity row would also block
+    every ledger insert that references the entity.
+    """
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(hashtext(%s))",
+            [f"dl_customer:{entity.pk}:{name}"],
+        )
+
+
+def create_missing_dl_customers(
+    entity: EntityModel,
+    customer_rows: Iterable[Tuple[str, Optional[str], Optional[str]]],
+    cache: dict,
+) -> Set:
+    """
+    Resolve (name, email, phone) rows against cache, creating the customers
+    that don't exist yet. Call this before an import's long-running
+    transaction: each creation then commits on its own and its lock is held
+    only for that one customer. Rows without a name are left for the caller.
 
+    Returns the pks of the customers created.
+    """
+    created_pks = set()
+    for name, email, phone in customer_rows:
+        if not (name or "").strip() or cache.get(customer_cache_key(name, email)) is not None:
+            continue
+        customer, created = get_or_create_dl_customer_for_jobber(
+            entity=entity,
+            client_name=name,
+            client_email=email,
+            client_phone=phone,
+            cache=cache,
+        )
+        if created:
+            created_pks.add(customer.pk)
+    return created_pks
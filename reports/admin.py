@@ -1,16 +1,53 @@
 from decimal import Decimal, InvalidOperation
 import csv
+import io
+from operator import itemgetter
 
 from django.contrib import admin
+from django.core.cache import cache
+from django.db.models import Max
 from django.http import HttpResponse
 from django.template.response import TemplateResponse
-from django.urls import path
+from django.shortcuts import redirect
+from django.urls import path, reverse
 from django.utils.translation import gettext_lazy as _
 
 from .models import InventoryReconciliationReport,ITxSnapshotReport, ITxTxDetailReport
 from . import views_itx
 
-from django_ledger.models import EntityModel, ItemModel, ItemTransactionModel
+from django_ledger.models import EntityModel, ItemModel, ItemTransactionModel, UnitOfMeasureModel
+
+_ZERO = Decimal("0")
+
+# Reconciliation rows are cached briefly so the page render and the CSV
+# download that usually follows it share one rollup.
+RECONCILIATION_CACHE_TTL = 300
+
+# CSV column order; each name is also the row-dict key it is read from.
+RECONCILIATION_CSV_COLUMNS = (
+    "item_uuid",
+    "item_number",
+    "item_name",
+    "sku",
+    "uom",
+
+    "inventory_received_model",
+    "inventory_received_value_model",
+    "avg_cost_model",
+
+    "qty_received_txn",
+    "cost_received_txn",
+    "qty_sold_txn",
+    "revenue_sold_txn",
+
+    "qty_onhand_txn",
+    "avg_cost_txn",
+    "value_onhand_txn",
+
+    "delta_received_qty",
+    "delta_received_value",
+)
+_reconciliation_csv_row = itemgetter(*RECONCILIATION_CSV_COLUMNS)
 
 
 @admin.register(InventoryReconciliationReport)
@@ -61,47 +98,60 @@ class InventoryReconciliationAdmin(admin.ModelAdmin):
                 "item_name": row.get("item_model__name"),
                 "uom_name": row.get("item_model__uom__name"),
 
-                "qty_received_txn": row.get("quantity_received") or Decimal("0"),
-                "cost_received_txn": row.get("cost_received") or Decimal("0"),
+                "qty_received_txn": row.get("quantity_received") or _ZERO,
+                "cost_received_txn": row.get("cost_received") or _ZERO,
 
-                "qty_sold_txn": row.get("quantity_invoiced") or Decimal("0"),
-                "revenue_sold_txn": row.get("revenue_invoiced") or Decimal("0"),
+                "qty_sold_txn": row.get("quantity_invoiced") or _ZERO,
+                "revenue_sold_txn": row.get("revenue_invoiced") or _ZERO,
 
-                "qty_onhand_txn": row.get("quantity_onhand") or Decimal("0"),
+                "qty_onhand_txn": row.get("quantity_onhand") or _ZERO,
 
-                "avg_cost_txn": row.get("cost_average") or Decimal("0"),
-                "value_onhand_txn": row.get("value_onhand") or Decimal("0"),
+                "avg_cost_txn": row.get("cost_average") or _ZERO,
+                "value_onhand_txn": row.get("value_onhand") or _ZERO,
             }
 
         # 2. Pull each ItemModel for that entity (what the system "thinks" you have)
-        item_qs = ItemModel.objects.for_entity(entity_model=entity).select_related("uom")
+        # An entity has a handful of UoMs; map them once instead of joining
+        # the uom row onto every item.
+        uom_names = dict(
+            UnitOfMeasureModel.objects.filter(entity_id=entity.uuid).values_list("pk", "name")
+        )
+        item_qs = (
+            ItemModel.objects.for_entity(entity_model=entity)
+            # The manager select_related()s uom by default; drop the join,
+            # names come from uom_names.
+            .select_related(None)
+            .only(
+                "uuid", "item_number", "name", "sku",
+                "inventory_received", "inventory_received_value",
+                "uom",
+            )
+        )
 
         # 3. Merge the two worlds
         for item in item_qs:
-            inv_recv_model = item.inventory_received or Decimal("0")
-            inv_recv_val_model = item.inventory_received_value or Decimal("0")
+            inv_recv_model = item.inventory_received or _ZERO
+            inv_recv_val_model = item.inventory_received_value or _ZERO
 
             # model avg cost (snapshot)
+            # (a zero Decimal is falsy, so one truth test covers the divide guard)
             try:
-                if inv_recv_model and inv_recv_model != 0:
-                    avg_cost_model = inv_recv_val_model / inv_recv_model
-                else:
-                    avg_cost_model = Decimal("0")
-            except (InvalidOperation, ZeroDivisionError):
-                avg_cost_model = Decimal("0")
+                avg_cost_model = inv_recv_val_model / inv_recv_model if inv_recv_model else _ZERO
+            except InvalidOperation:
+                avg_cost_model = _ZERO
 
             roll = txn_rollup_map.get(item.uuid)
 
             if roll is None:
                 # item exists in ItemModel but has no transaction history
-                qty_received_txn = Decimal("0")
-                cost_received_txn = Decimal("0")
-                qty_sold_txn = Decimal("0")
-                revenue_sold_txn = Decimal("0")
-                qty_onhand_txn = Decimal("0")
-                avg_cost_txn = Decimal("0")
-                value_onhand_txn = Decimal("0")
-                uom_name = getattr(item.uom, "name", "")
+                qty_received_txn = _ZERO
+                cost_received_txn = _ZERO
+                qty_sold_txn = _ZERO
+                revenue_sold_txn = _ZERO
+                qty_onhand_txn = _ZERO
+                avg_cost_txn = _ZERO
+                value_onhand_txn = _ZERO
+                uom_name = uom_names.get(item.uom_id, "")
                 item_name = item.name
             else:
                 qty_received_txn = roll["qty_received_txn"]
@@ -111,7 +161,7 @@ class InventoryReconciliationAdmin(admin.ModelAdmin):
                 qty_onhand_txn = roll["qty_onhand_txn"]
                 avg_cost_txn = roll["avg_cost_txn"]
                 value_onhand_txn = roll["value_onhand_txn"]
-                uom_name = roll["uom_name"] or getattr(item.uom, "name", "")
+                uom_name = roll["uom_name"] or uom_names.get(item.uom_id, "")
                 item_name = roll["item_name"] or item.name
 
             delta_received_qty = qty_received_txn - inv_recv_model
@@ -143,6 +193,31 @@ class InventoryReconciliationAdmin(admin.ModelAdmin):
 
         return rows_out
 
+    def _get_reconciliation_rows(self, entity):
+        """
+        Cached wrapper around _build_reconciliation_rows().
+
+        The key carries the latest `updated` stamp of the entity's transactions
+        and items, so any new activity or snapshot rebuild yields a fresh key.
+        """
+        tx_version = ItemTransactionModel.objects.filter(
+            item_model__entity_id=entity.uuid
+        ).aggregate(m=Max("updated"))["m"]
+        item_version = ItemModel.objects.filter(
+            entity_id=entity.uuid
+        ).aggregate(m=Max("updated"))["m"]
+
+        key = "invrecon:{}:{}:{}".format(
+            entity.uuid,
+            tx_version.timestamp() if tx_version else 0,
+            item_version.timestamp() if item_version else 0,
+        )
+        rows = cache.get(key)
+        if rows is None:
+            rows = self._build_reconciliation_rows(entity)
+            cache.set(key, rows, RECONCILIATION_CACHE_TTL)
+        return rows
+
     #
     # 1. Override changelist_view so Django doesn't try to query a table.
     #    We build context ourselves.
@@ -155,7 +230,7 @@ class InventoryReconciliationAdmin(admin.ModelAdmin):
         if entity is None:
             no_entity_message = "No entity available for this user. Cannot build reconciliation."
         else:
-            rows = self._build_reconciliation_rows(entity)
+            rows = self._get_reconciliation_rows(entity)
 
         context = {
             **self.admin_site.each_context(request),
@@ -203,64 +278,19 @@ class InventoryReconciliationAdmin(admin.ModelAdmin):
             resp["Content-Disposition"] = 'attachment; filename="inventory_reconciliation_ERROR.txt"'
             return resp
 
-        rows = self._build_reconciliation_rows(entity)
+        rows = self._get_reconciliation_rows(entity)
 
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="inventory_reconciliation.csv"'
+        # Format into one in-memory buffer and hand the response a single
+        # string, rather than a response.write() (and encode) per CSV line.
+        buf = io.StringIO()
+        writer = csv.writer(buf)
 
-        writer = csv.writer(response)
-
-        # Header row
-        writer.writerow([
-            "item_uuid",
-            "item_number",
-            "item_name",
-            "sku",
-            "uom",
-
-            "inventory_received_model",
-            "inventory_received_value_model",
-            "avg_cost_model",
-
-            "qty_received_txn",
-            "cost_received_txn",
-            "qty_sold_txn",
-            "revenue_sold_txn",
-
-            "qty_onhand_txn",
-            "avg_cost_txn",
-            "value_onhand_txn",
-
-            "delta_received_qty",
-            "delta_received_value",
-        ])
-
-        # Data rows
-        for r in rows:
-            writer.writerow([
-                r["item_uuid"],
-                r["item_number"],
-                r["item_name"],
-                r["sku"],
-                r["uom"],
-
-                str(r["inventory_received_model"]),
-                str(r["inventory_received_value_model"]),
-                str(r["avg_cost_model"]),
-
-                str(r["qty_received_txn"]),
-                str(r["cost_received_txn"]),
-                str(r["qty_sold_txn"]),
-                str(r["revenue_sold_txn"]),
-
-                str(r["qty_onhand_txn"]),
-                str(r["avg_cost_txn"]),
-                str(r["value_onhand_txn"]),
-
-                str(r["delta_received_qty"]),
-                str(r["delta_received_value"]),
-            ])
+        writer.writerow(RECONCILIATION_CSV_COLUMNS)
+        # Rows are plain dicts; csv.writer stringifies the Decimals itself.
+        writer.writerows(map(_reconciliation_csv_row, rows))
 
+        response = HttpResponse(buf.getvalue(), content_type="text/csv")
+        response["Content-Disposition"] = 'attachment; filename="inventory_reconciliation.csv"'
         return response
 
     #
@@ -289,8 +319,6 @@ class _ReportAdminBase(admin.ModelAdmin):
     # We only use the "change list" page as a landing page with a Download button.
     def changelist_view(self, request, extra_context=None):
         # Redirect to page that includes entity slug in URL
-        from django.shortcuts import redirect
-        from django_ledger.models import EntityModel
         # Pick the first accessible entity; if you already pass entity_slug elsewhere, adapt as needed.
         entity = EntityModel.objects.for_user(user_model=request.user).first()
         if not entity:
@@ -300,8 +328,6 @@ class _ReportAdminBase(admin.ModelAdmin):
     def entry_url(self, entity_slug: str) -> str:
         raise NotImplementedError  # implemented by subclasses
 
-# reports/admin.py  (only the parts shown below need updating)
-
 @admin.register(ITxSnapshotReport)
 class ITxSnapshotReportAdmin(_ReportAdminBase):
     def get_urls(self):
@@ -321,25 +347,10 @@ class ITxSnapshotReportAdmin(_ReportAdminBase):
         return custom + urls
 
     def entry_url(self, slug):
-        from django.urls import reverse
         # NOTE: include the admin namespace
         return reverse(f"{self.admin_site.name}:adminreports-itx-snapshot",
                        kwargs={"entity_slug": slug})
-    def get_urls(self):
-        urls = super().get_urls()
-        custom_urls = [
-            path(
-            "itxsnapshotreport/itx-snapshot/<slug:entity_slug>/",
-            self.admin_site.admin_view(views_itx.ITxSnapshotPage.as_view()),
-            name="adminreports-itx-snapshot",
-        ),
-            path(
-            "itxsnapshotreport/itx-snapshot/<slug:entity_slug>/csv/",
-            self.admin_site.admin_view(views_itx.itx_tx_detail_csv),
-            name="adminreports-itx-snapshot-csv",
-        ),
-    ]
-        return custom_urls + urls
+
 
 @admin.register(ITxTxDetailReport)
 class ITxTxDetailReportAdmin(_ReportAdminBase):
@@ -360,7 +371,6 @@ class ITxTxDetailReportAdmin(_ReportAdminBase):
         return custom + urls
 
     def entry_url(self, slug):
-        from django.urls import reverse
         # NOTE: include the admin namespace
         return reverse(f"{self.admin_site.name}:adminreports-itx-tx-detail",
                        kwargs={"entity_slug": slug})
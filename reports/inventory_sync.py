@@ -1,10 +1,28 @@
-from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
-from typing import Dict, Any, Optional
-
-from django.db import transaction
-from django.db.models import F
+from concurrent.futures import ThreadPoolExecutor
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from functools import lru_cache
+import os
+from typing import Dict, Any, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, Sum, Value
+from django.db.models.functions import Cast, Round
+from django.utils import timezone
 from django_ledger.models import EntityModel, ItemModel, ItemTransactionModel
 
+# Upper bound on entities rebuilt at once by rebuild_all_entities().
+REBUILD_MAX_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+# Rows per UPDATE statement when writing changed item snapshots back.
+SNAPSHOT_UPDATE_BATCH_SIZE = 1000
+
+# Output type for the quantity/cost rollups.
+_COST_OUTPUT = DecimalField(max_digits=20, decimal_places=4)
+
+# NUMERIC type the float quantity/unit cost columns are cast to before any
+# arithmetic: wide enough that only the final per-line ROUND(..., 4) rounds.
+_FACTOR = DecimalField(max_digits=30, decimal_places=10)
+
 
 # Helper: safe Decimal converter
 def _to_decimal(val) -> Decimal:
@@ -20,39 +38,46 @@ def _to_decimal(val) -> Decimal:
         return Decimal(str(val))
     except (InvalidOperation, ValueError, TypeError):
         return Decimal("0")
-def _get_tx_qty(tx) -> Decimal:
-    """
-    Safely read the quantity received on this transaction row as Decimal.
-    In your admin it's labeled 'Quantity:'.
-    Django Ledger usually calls this field `quantity`.
+
+
+# Per-unit cost field on ItemTransactionModel. Different Django Ledger
+# versions name this differently; the first concrete field found wins.
+_TX_UNIT_COST_CANDIDATES = (
+    "cost_per_unit",
+    "unit_cost",
+    "po_unit_cost",
+    "po_unit_price",
+    "cost_per_item",
+    "cost",
+)
+
+
+@lru_cache(maxsize=None)
+def _tx_unit_cost_field() -> Optional[str]:
     """
-    return _to_decimal(getattr(tx, "quantity", 0))
-def _get_tx_unit_cost(tx) -> Decimal:
+    Name of the per-unit cost column on ItemTransactionModel, or None if
+    none of the known candidates exist (treated as zero cost).
+
+    The model's fields don't change at runtime, so this is resolved once per
+    process (lazily, so importing this module doesn't need the app registry).
     """
-    Safely read the per-unit cost for this transaction row as Decimal.
+    field_names = {f.name for f in ItemTransactionModel._meta.concrete_fields}
+    for cand in _TX_UNIT_COST_CANDIDATES:
+        if cand in field_names:
+            return cand
+    return None
 
-    Different Django Ledger versions name this differently. We'll try a few:
-    - 'cost_per_unit'   (what we *thought* it was)
-    - 'unit_cost'
-    - 'po_unit_cost'
-    - 'po_unit_price'
-    - 'cost' (last resort)
 
-    Whatever we find first, we convert to Decimal.
+@lru_cache(maxsize=None)
+def _snapshot_quantums() -> Tuple[Decimal, Decimal]:
     """
-    for cand in [
-        "cost_per_unit",
-        "unit_cost",
-        "po_unit_cost",
-        "po_unit_price",
-        "cost_per_item",
-        "cost",
-    ]:
-        if hasattr(tx, cand):
-            return _to_decimal(getattr(tx, cand))
-    # if literally nothing matched, treat as zero cost
-    return Decimal("0")
-
+    Quantize exponents matching the decimal_places of ItemModel's
+    inventory_received / inventory_received_value columns, resolved once.
+    """
+    return tuple(
+        Decimal(1).scaleb(-ItemModel._meta.get_field(name).decimal_places)
+        for name in ("inventory_received", "inventory_received_value")
+    )
 
 
 def rebuild_item_snapshots_for_entity(entity: EntityModel) -> Dict[str, Any]:
@@ -63,102 +88,147 @@ def rebuild_item_snapshots_for_entity(entity: EntityModel) -> Dict[str, Any]:
     Returns a dict summary you can print/log.
     """
 
-    # 1. get all item transactions for this entity where we actually received inventory
+    # 1. roll up item transactions for this entity where we actually received inventory,
+    # grouped per item in the database.
     # We consider "received" inventory only. You don't want ordered or in-transit.
-    tx_qs = (
+    cost_field = _tx_unit_cost_field()
+    if cost_field:
+        # Django Ledger stores quantity and unit cost as floats; cast both to
+        # wide NUMERIC first so the product, ROUND(numeric, 4) and SUM stay exact
+        # and each line is rounded once, on the product.
+        # Each line's cost is rounded to 4 places (half away from zero) before summing.
+        line_cost = Round(
+            Cast("quantity", _FACTOR) * Cast(cost_field, _FACTOR),
+            4,
+        )
+        cost_total = Sum(line_cost, output_field=_COST_OUTPUT)
+    else:
+        # if literally nothing matched, treat as zero cost
+        cost_total = Value(Decimal("0"), output_field=_COST_OUTPUT)
+
+    tx_totals = (
         ItemTransactionModel.objects.filter(
             item_model__entity_id=entity.uuid,
         )
         .filter(po_item_status__iexact="received")  # only things that actually landed
-        .select_related("item_model")
+        .order_by()
+        .values("item_model_id")
+        .annotate(
+            qty=Sum(Cast("quantity", _FACTOR)),
+            cost_total=cost_total,
         )
-
-
-    rolled: Dict[str, Dict[str, Decimal]] = {}
-
-    for tx in tx_qs:
-        item_id = tx.item_model_id
-
-        # quantity received on this line
-        qty = _get_tx_qty(tx)  # Decimal
-        unit_cost = _get_tx_unit_cost(tx)  # Decimal
-
-        
-
-        line_total_cost = (qty * unit_cost).quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
-
-        if item_id not in rolled:
-            rolled[item_id] = {
-                "qty": Decimal("0"),
-                "cost_total": Decimal("0"),
-            }
-
-        rolled[item_id]["qty"] += qty           # both are Decimal now
-        rolled[item_id]["cost_total"] += line_total_cost
+    )
+
+    # The sums arrive as NUMERIC -> Decimal, so the rollup keeps exact accounting
+    # precision without any per-transaction arithmetic in Python. A group whose
+    # values are all NULL sums to NULL; _to_decimal() maps that to 0 here rather
+    # than wrapping each aggregate in COALESCE.
+    rolled: Dict[str, Dict[str, Decimal]] = {
+        item_id: {
+            "qty": _to_decimal(qty),
+            "cost_total": _to_decimal(cost),
+        }
+        for item_id, qty, cost in tx_totals.values_list("item_model_id", "qty", "cost_total")
+    }
 
     # 2. write rolled totals back into each ItemModel.snapshot
-    updated_items = 0
     zero_items = 0
 
-    # We only touch items that belong to this entity.
-    item_qs = ItemModel.objects.filter(entity_id=entity.uuid)
-
-    with transaction.atomic():
-        for item in item_qs:
-            data = rolled.get(item.uuid)
-
-            if not data:
-                # nothing received ever (or nothing received left marked "received")
-                # We'll leave item alone EXCEPT we keep it consistent:
-                item.inventory_received = Decimal("0")
-                item.inventory_received_value = Decimal("0")
-                updated_items += 1
-                zero_items += 1
-                item.save(
-                    update_fields=[
-                        "inventory_received",
-                        "inventory_received_value",
-                        "updated",
-                    ]
-                )
-                continue
-
-            total_qty = data["qty"]
-            total_cost_val = data["cost_total"]
-
-            
-
-            # Assign back into the snapshot that Django Ledger uses on ItemModel
-            item.inventory_received = total_qty
-            item.inventory_received_value = total_cost_val
-
-            # NOTE: we are NOT touching accounting accounts (COGS, earnings, etc).
-            # We are only rebuilding the snapshot totals that "available to sell" logic uses.
-
-            item.save(
-                update_fields=[
+    # We only touch items that belong to this entity, and only read the
+    # snapshot columns the comparison and bulk_update() need (dropping the
+    # manager's default select_related('uom'), which only() can't defer).
+    items = list(
+        ItemModel.objects.filter(entity_id=entity.uuid).select_related(None).only(
+            "uuid", "inventory_received", "inventory_received_value", "updated",
+        )
+    )
+    to_update = []
+
+    # bulk_update() skips auto_now, so stamp `updated` the way save() would.
+    now = timezone.now()
+    qty_quantum, cost_quantum = _snapshot_quantums()
+
+    for item in items:
+        data = rolled.get(item.uuid)
+
+        if not data:
+            # nothing received ever (or nothing received left marked "received")
+            # We'll leave item alone EXCEPT we keep it consistent:
+            new_qty = Decimal("0")
+            new_cost = Decimal("0")
+            zero_items += 1
+        else:
+            # Round to the stored precision (as PostgreSQL would on write) so
+            # the comparison below matches an unchanged snapshot.
+            new_qty = data["qty"].quantize(qty_quantum, rounding=ROUND_HALF_UP)
+            new_cost = data["cost_total"].quantize(cost_quantum, rounding=ROUND_HALF_UP)
+
+        # Snapshot already matches the transactions; don't rewrite the row.
+        if (
+            item.inventory_received == new_qty
+            and item.inventory_received_value == new_cost
+        ):
+            continue
+
+        # Assign back into the snapshot that Django Ledger uses on ItemModel
+        # NOTE: we are NOT touching accounting accounts (COGS, earnings, etc).
+        # We are only rebuilding the snapshot totals that "available to sell" logic uses.
+        item.inventory_received = new_qty
+        item.inventory_received_value = new_cost
+        item.updated = now
+        to_update.append(item)
+
+    updated_items = len(to_update)
+    if to_update:
+        with transaction.atomic():
+            ItemModel.objects.bulk_update(
+                to_update,
+                [
                     "inventory_received",
                     "inventory_received_value",
                     "updated",
-                ]
+                ],
+                batch_size=SNAPSHOT_UPDATE_BATCH_SIZE,
             )
-            updated_items += 1
 
     return {
         "entity": str(entity.slug),
-        "items_considered": item_qs.count(),
+        "items_considered": len(items),
         "items_updated": updated_items,
         "items_zeroed": zero_items,
         "rolled_count": len(rolled),
     }
 
 
-def rebuild_all_entities() -> Dict[str, Dict[str, Any]]:
+def _rebuild_entity_in_thread(entity: EntityModel) -> Dict[str, Any]:
+    """
+    Worker for rebuild_all_entities(): each thread gets its own DB connection,
+    so close it when the entity is done instead of leaking it.
+    """
+    try:
+        return rebuild_item_snapshots_for_entity(entity)
+    finally:
+        connection.close()
+
+
+def rebuild_all_entities(max_workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
     """
     Run the rebuild for every entity that exists.
     Returns a dict keyed by entity slug with summary.
+
+    Entities touch disjoint items, so they are rebuilt concurrently on a small
+    thread pool; the work is DB round-trips, which release the GIL.
+    `max_workers` (default REBUILD_MAX_WORKERS) also bounds how many DB
+    connections the rebuild holds open at once.
     """
-    out: Dict[str, Dict[str, Any]] = {}
-    for entity in EntityModel.objects.all():
-        out[str(entity.slug)] = rebuild_item_snapshots_for_entity(entity)
-    return out
+    entities = list(EntityModel.objects.all())
+    if not entities:
+        return {}
+
+    max_workers = max(1, min(max_workers or REBUILD_MAX_WORKERS, len(entities)))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(_rebuild_entity_in_thread, entities)
+        return {
+            str(entity.slug): summary
+            for entity, summary in zip(entities, results)
+        }
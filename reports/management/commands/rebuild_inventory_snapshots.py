@@ -19,6 +19,15 @@ class Command(BaseCommand):
             type=str,
             help="Entity slug to rebuild. If omitted, rebuilds ALL entities.",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help=(
+                "How many entities to rebuild at once when rebuilding ALL "
+                "(default: min(8, 2 x CPUs); keep within your DB connection limit)."
+            ),
+        )
 
     def handle(self, *args, **options):
         entity_slug = options.get("entity")
@@ -32,7 +41,10 @@ class Command(BaseCommand):
             result = rebuild_item_snapshots_for_entity(entity)
             self.stdout.write(self.style.SUCCESS(f"[OK] Rebuilt {entity_slug}: {result}"))
         else:
-            result = rebuild_all_entities()
+            workers = options.get("workers")
+            if workers is not None and workers < 1:
+                raise CommandError("--workers must be at least 1.")
+            result = rebuild_all_entities(max_workers=workers)
             self.stdout.write(self.style.SUCCESS("[OK] Rebuilt ALL entities"))
             for slug, summary in result.items():
                 self.stdout.write(f" - {slug}: {summary}")
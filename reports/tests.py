@@ -0,0 +1,115 @@
+# Absolute imports: the reports folder has no __init__.py, so test discovery
+# imports this file as a top-level module.
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+from uuid import uuid4
+
+from django.contrib.messages import get_messages
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import resolve, reverse
+
+from django_ledger.models import ItemTransactionModel
+
+from reports.views import download_report, health_check, liveness
+from reports.views_inventory_safe import SafeInventoryRecountView
+from reports.views_itx import _itx_snapshot_rows
+
+
+class ReportsUrlTests(TestCase):
+    """
+    reports.urls imports its views and is mounted under /reports/.
+    """
+
+    def test_reports_urls_resolve(self):
+        self.assertEqual(reverse("reports:health"), "/reports/health/")
+        self.assertEqual(reverse("reports:liveness"), "/reports/health/live/")
+        self.assertEqual(resolve("/reports/health/").func, health_check)
+        self.assertEqual(resolve("/reports/health/live/").func, liveness)
+        self.assertEqual(
+            resolve("/reports/downloads/payments_to_deposit_2025.csv/").func, download_report
+        )
+        self.assertEqual(resolve("/downloads/payments_to_deposit_2025.csv/").func, download_report)
+
+    def test_liveness_is_anonymous(self):
+        response = self.client.get("/reports/health/live/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"ok")
+
+    def test_downloads_require_staff(self):
+        response = self.client.get("/reports/downloads/views.py/")
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("/admin/login/", response["Location"])
+
+
+class RecountConfirmTests(SimpleTestCase):
+    """
+    ?confirm= handling in SafeInventoryRecountView.get(); never writes.
+    """
+
+    def _get(self, confirm):
+        request = RequestFactory().get("/", {"confirm": confirm})
+        request._messages = CookieStorage(request)
+        view = SafeInventoryRecountView()
+        view.setup(request, entity_slug="acme")
+        return request, view.get(request, entity_slug="acme")
+
+    def test_non_integer_confirm_is_bad_request(self):
+        _, response = self._get("yes")
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_confirm_code_is_not_found(self):
+        _, response = self._get("7")
+        self.assertEqual(response.status_code, 404)
+
+    def test_confirm_redirects_with_warning(self):
+        request, response = self._get("1")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            response["Location"],
+            reverse("safe-inventory-recount", kwargs={"entity_slug": "acme"}),
+        )
+        self.assertIn("Snapshot NOT auto-updated", [str(m) for m in get_messages(request)][0])
+
+
+class ItxSnapshotRowsTests(TestCase):
+    """
+    _itx_snapshot_rows() builds CSV rows from inventory_count() dict rows.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rows_from_inventory_count(self):
+        entity = SimpleNamespace(uuid=uuid4())
+        item_id = uuid4()
+        counted = [
+            {"item_model_id": None},
+            {
+                "item_model_id": item_id,
+                "item_model__name": "Print",
+                "item_model__uom__name": "ea",
+                "quantity_received": Decimal("5"),
+                "cost_received": Decimal("50"),
+                "quantity_invoiced": 2.0,
+                "revenue_invoiced": Decimal("80"),
+                "quantity_onhand": Decimal("3"),
+                "cost_average": Decimal("10"),
+                "value_onhand": Decimal("30"),
+            },
+        ]
+        with mock.patch.object(
+            ItemTransactionModel.objects, "inventory_count", return_value=counted
+        ) as inventory_count:
+            rows = _itx_snapshot_rows(entity)
+            # Served from the cache while nothing changed.
+            self.assertEqual(_itx_snapshot_rows(entity), rows)
+
+        inventory_count.assert_called_once_with(entity_model=entity)
+        self.assertEqual(rows, [[
+            item_id, "", "Print", "", "ea",
+            Decimal("5.000"), Decimal("50.000"), Decimal("2.000"), Decimal("80.000"),
+            Decimal("3.000"), Decimal("10.000"), Decimal("30.000"),
+        ]])
@@ -1,11 +1,12 @@
 # reports/urls.py
 from django.urls import path
-from . import views
+from .views import download_report, health_check, liveness
 
 app_name = "reports"
 
 
 urlpatterns = [
-    path("health/", views.health_check, name="health"),
-    path("downloads/<str:filename>/", download_report, name="download_report"),
+    path("health/", health_check, name="health"),
+    path("health/live/", liveness, name="liveness"),
+    path("downloads/<path:filename>/", download_report, name="download_report"),
 ]
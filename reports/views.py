@@ -4,16 +4,42 @@ from django.http import HttpResponse
 from django.http import FileResponse, Http404
 from pathlib import Path
 
+# The folder where *this file* lives (the reports app folder)
+_REPORTS_APP_DIR = Path(__file__).resolve().parent
+
+# Only exported data files are downloadable; the app's source, templates,
+# migrations and sub-packages share the folder and must never be served.
+_DOWNLOADABLE_SUFFIXES = frozenset({".csv"})
+
+@staff_member_required
 def download_report(request, filename):
-    # This points to the folder where *this file* lives (the reports app folder)
-    reports_app_dir = Path(__file__).resolve().parent
+    reports_app_dir = _REPORTS_APP_DIR
+
+    file_path = (reports_app_dir / filename).resolve()
 
-    file_path = reports_app_dir / filename
+    # Only serve report files sitting directly in the reports folder; reject
+    # anything in a sub-directory, outside it, or not a report file type
+    # before touching the filesystem further.
+    if file_path.parent != reports_app_dir or file_path.suffix.lower() not in _DOWNLOADABLE_SUFFIXES:
+        raise Http404("Report not found")
 
-    if not file_path.exists() or not file_path.is_file():
+    # is_file() is False for missing paths too, so one stat covers both checks.
+    if not file_path.is_file():
         raise Http404("Report not found")
 
-    return FileResponse(open(file_path, "rb"), as_attachment=True, filename=filename)
+    # FileResponse hands the raw file object to the server's wsgi.file_wrapper,
+    # which uses sendfile() where the server supports it.
+    return FileResponse(file_path.open("rb"), as_attachment=True, filename=filename)
+
+
+def liveness(request):
+    """
+    Unauthenticated liveness probe for load balancers / uptime checks.
+
+    Never touches request.user or the session, so (unlike health_check) it
+    costs no session or user query per hit.
+    """
+    return HttpResponse(b"ok", content_type="text/plain")
 
 
 @staff_member_required
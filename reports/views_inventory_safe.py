@@ -12,6 +12,9 @@ from django_ledger.models import EntityModel
 from django_ledger.models.items import ItemTransactionModel
 from django_ledger.views.mixins import DjangoLedgerSecurityMixIn
 
+# Accepted values for the stock view's ?confirm= flag.
+_VALID_CONFIRM = frozenset((0, 1))
+
 
 class SafeInventoryRecountView(DjangoLedgerSecurityMixIn, DetailView):
     """
@@ -38,7 +41,7 @@ class SafeInventoryRecountView(DjangoLedgerSecurityMixIn, DetailView):
     slug_url_kwarg = 'entity_slug'
 
     def get_queryset(self):
-        if not hasattr(self, 'queryset', None):
+        if getattr(self, 'queryset', None) is None:
             self.queryset = EntityModel.objects.for_user(
                 user_model=self.request.user
             )
@@ -57,16 +60,23 @@ class SafeInventoryRecountView(DjangoLedgerSecurityMixIn, DetailView):
         return recorded_qs
 
     def get_context_data(self, adjustment=None, counted_qs=None, recorded_qs=None, **kwargs):
-        self.object = self.get_object()
+        # get() already resolved the entity; only look it up if called directly.
+        if getattr(self, 'object', None) is None:
+            self.object = self.get_object()
         context = super().get_context_data(**kwargs)
         context['page_title'] = _('Inventory Recount')
         context['header_title'] = _('Inventory Recount')
 
-        recorded_qs = self.recorded_inventory() if not recorded_qs else recorded_qs
-        counted_qs = self.counted_inventory() if not counted_qs else counted_qs
+        # `is None`, not truthiness: a passed-in queryset must not be evaluated
+        # (or replaced) just to test whether it is empty.
+        if recorded_qs is None:
+            recorded_qs = self.recorded_inventory()
+        if counted_qs is None:
+            counted_qs = self.counted_inventory()
 
         # EntityModel.inventory_adjustment() basically diffs counted vs recorded
-        adjustment = EntityModel.inventory_adjustment(counted_qs, recorded_qs) if not adjustment else adjustment
+        if adjustment is None:
+            adjustment = EntityModel.inventory_adjustment(counted_qs, recorded_qs)
 
         context['count_inventory_received'] = counted_qs
         context['current_inventory_levels'] = recorded_qs
@@ -95,9 +105,8 @@ class SafeInventoryRecountView(DjangoLedgerSecurityMixIn, DetailView):
                 confirm = int(confirm)
             except (TypeError, ValueError):
                 return HttpResponseBadRequest('Invalid confirm code.')
-            finally:
-                if confirm not in [0, 1]:
-                    return HttpResponseNotFound('Invalid confirm code.')
+            if confirm not in _VALID_CONFIRM:
+                return HttpResponseNotFound('Invalid confirm code.')
 
             # DO NOT WRITE ANYTHING.
             messages.add_message(
@@ -119,5 +128,6 @@ class SafeInventoryRecountView(DjangoLedgerSecurityMixIn, DetailView):
                 )
             )
 
+        self.object = self.get_object()
         context = self.get_context_data(**kwargs)
         return self.render_to_response(context)
@@ -1,17 +1,36 @@
 # reports/views_itx.py
-from decimal import Decimal
-from django.http import HttpResponse
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.core.cache import cache
+from django.db.models import CharField, DecimalField, ExpressionWrapper, F, Max, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils.cache import patch_vary_headers
 from django.utils.encoding import smart_str
+from django.utils.text import compress_sequence, compress_string
 from django.contrib.admin.views.decorators import staff_member_required
 
 from django_ledger.models import EntityModel
 from django_ledger.views.mixins import DjangoLedgerSecurityMixIn
-from django_ledger.models.items import ItemTransactionModel
+from django_ledger.models.items import ItemModel, ItemTransactionModel
 
 from django.views.generic import DetailView
 from django.urls import reverse
 
 import csv
+import io
+import re
+
+
+def _entity_qs(user):
+    """
+    Entities the user may see, narrowed to the columns these report pages and
+    exports use (the slug lookup, the uuid filter and the title). for_user()
+    select_related()s the default CoA, which only() can't defer, so that join
+    is dropped first.
+    """
+    return EntityModel.objects.for_user(user_model=user).select_related(None).only("uuid", "slug", "name")
+
 
 # ---- Admin landing pages (show a "Download CSV" button) ----
 
@@ -21,12 +40,12 @@ class ITxSnapshotPage(DjangoLedgerSecurityMixIn, DetailView):
 
     def get_queryset(self):
         # Used only to resolve the entity by slug with permission checks
-        if not self.queryset:
-            self.queryset = EntityModel.objects.for_user(user_model=self.request.user)
+        # (`is None`: truth-testing a QuerySet would fetch every entity)
+        if self.queryset is None:
+            self.queryset = _entity_qs(self.request.user)
         return super().get_queryset()
 
     def get_context_data(self, **kwargs):
-        self.object = self.get_object()
         ctx = super().get_context_data(**kwargs)
         ctx["page_title"] = "ITx On-Hand Snapshot"
         ctx["header_title"] = "ITx On-Hand Snapshot"
@@ -39,12 +58,11 @@ class ITxTxDetailPage(DjangoLedgerSecurityMixIn, DetailView):
     slug_url_kwarg = "entity_slug"
 
     def get_queryset(self):
-        if not self.queryset:
-            self.queryset = EntityModel.objects.for_user(user_model=self.request.user)
+        if self.queryset is None:
+            self.queryset = _entity_qs(self.request.user)
         return super().get_queryset()
 
     def get_context_data(self, **kwargs):
-        self.object = self.get_object()
         ctx = super().get_context_data(**kwargs)
         ctx["page_title"] = "ITx Transaction Detail"
         ctx["header_title"] = "ITx Transaction Detail"
@@ -54,98 +72,236 @@ class ITxTxDetailPage(DjangoLedgerSecurityMixIn, DetailView):
 
 # ---- CSV download endpoints ----
 
+# Static header lines, formatted once (plain names, so no quoting; csv.writer's
+# default "\r\n" terminator).
+_SNAPSHOT_HEADER = ",".join([
+    "item_uuid", "item_number", "item_name", "sku", "uom",
+    "qty_received", "cost_received",
+    "qty_invoiced", "revenue_invoiced",
+    "qty_onhand", "avg_cost", "value_onhand",
+]) + "\r\n"
+
+_TX_DETAIL_HEADER = ",".join([
+    "tx_uuid", "created",
+    "item_uuid", "item_number", "item_name", "sku", "uom",
+    "po_number", "bill_number", "invoice_number",
+    "po_item_status", "entity_unit",
+    "quantity", "po_unit_cost", "bill_unit_cost", "total_amount",
+    "notes",
+]) + "\r\n"
+
+
 @staff_member_required
 def itx_snapshot_csv(request, entity_slug):
-    entity = EntityModel.objects.for_user(user_model=request.user).get(slug=entity_slug)
-
-    # Use the ledger’s own aggregate to respect received − sold ± any adjustments
-    agg = ItemTransactionModel.objects.inventory_count(entity_model=entity)
+    entity = _entity_qs(request.user).get(slug=entity_slug)
 
     # CSV
     resp = HttpResponse(content_type="text/csv")
     resp["Content-Disposition"] = f'attachment; filename="{smart_str(entity.slug)}_itx_onhand_snapshot.csv"'
-    w = csv.writer(resp)
-    w.writerow([
-        "item_uuid", "item_number", "item_name", "sku", "uom",
-        "qty_received", "cost_received",
-        "qty_invoiced", "revenue_invoiced",
-        "qty_onhand", "avg_cost", "value_onhand",
-    ])
-
-    for (item_id, item_number, item_name, sku, uom), vals in agg.items():
-        w.writerow([
-            item_id, item_number, item_name, sku, uom,
-            _d(vals.get("received", 0)),
-            _d(vals.get("received_value", 0)),
-            _d(vals.get("sold", 0)),
-            _d(vals.get("revenue_sold", 0)),
-            _d(vals.get("on_hand", 0)),
-            _d(vals.get("avg_cost", 0)),
-            _d(vals.get("value_on_hand", 0)),
+    resp.write(_SNAPSHOT_HEADER)
+    csv.writer(resp).writerows(_itx_snapshot_rows(entity))
+    return _gzip_if_accepted(request, resp)
+
+
+# Repeat downloads within this window reuse the rollup (the key also changes
+# as soon as a transaction or item of the entity is updated).
+ITX_SNAPSHOT_CACHE_TTL = 600
+
+
+def _itx_snapshot_rows(entity):
+    """
+    CSV data rows for the on-hand snapshot, cached per entity.
+    """
+    tx_version = ItemTransactionModel.objects.filter(
+        item_model__entity_id=entity.uuid
+    ).aggregate(m=Max("updated"))["m"]
+    item_version = ItemModel.objects.filter(
+        entity_id=entity.uuid
+    ).aggregate(m=Max("updated"))["m"]
+
+    key = "itx:snap:{}:{}:{}".format(
+        entity.uuid,
+        tx_version.timestamp() if tx_version else 0,
+        item_version.timestamp() if item_version else 0,
+    )
+    out = cache.get(key)
+    if out is not None:
+        return out
+
+    # Use the ledger’s own aggregate to respect received − sold ± any adjustments
+    agg = ItemTransactionModel.objects.inventory_count(entity_model=entity)
+
+    # inventory_count() is one GROUP BY item_model_id query of dict rows that
+    # already carries the SQL-computed on-hand, average cost and on-hand value;
+    # the item number/SKU it doesn't carry come from one more query, merged here.
+    # That query filters by entity rather than shipping every item uuid back
+    # to Postgres in an IN (...) list.
+    item_cols = {
+        uuid: (item_number, sku)
+        for uuid, item_number, sku in ItemModel.objects.filter(
+            entity_id=entity.uuid
+        ).values_list("uuid", "item_number", "sku")
+    }
+
+    out = []
+    for row in agg:
+        if not row.get("item_model_id"):
+            continue
+        item_id = row["item_model_id"]
+        item_number, sku = item_cols.get(item_id, ("", ""))
+        out.append([
+            item_id, item_number, row.get("item_model__name"), sku or "", row.get("item_model__uom__name"),
+            _d(row.get("quantity_received")),
+            _d(row.get("cost_received")),
+            _d(row.get("quantity_invoiced")),
+            _d(row.get("revenue_invoiced")),
+            _d(row.get("quantity_onhand")),
+            _d(row.get("cost_average")),
+            _d(row.get("value_onhand")),
         ])
-    return resp
+
+    cache.set(key, out, ITX_SNAPSHOT_CACHE_TTL)
+    return out
 
 
 @staff_member_required
 def itx_tx_detail_csv(request, entity_slug):
-    entity = EntityModel.objects.for_user(user_model=request.user).get(slug=entity_slug)
+    entity = _entity_qs(request.user).get(slug=entity_slug)
+
+    bill_cost_field, notes_field = _tx_detail_optional_fields()
+    # quantity and the unit costs are FloatFields in Django Ledger; cast them to
+    # the export's NUMERIC type so NullIf/Coalesce compare like with like.
+    bill_uc = (
+        NullIf(Cast(bill_cost_field, _TX_AMOUNT), Value(_ZERO), output_field=_TX_AMOUNT)
+        if bill_cost_field else Value(None, output_field=_TX_AMOUNT)
+    )
 
+    # Tuples in CSV column order, with every join and the total fallback
+    # (quantity * bill-or-PO unit cost when total_amount is missing or zero)
+    # resolved in the one query; no model instances per transaction.
     qs = (
         ItemTransactionModel.objects
         .filter(item_model__entity_id=entity.uuid)
-        .select_related(
-            "item_model",
-            "po_model", "bill_model", "invoice_model",
-            "entity_unit",
-        )
         .order_by("created")
+        .annotate(
+            export_bill_unit_cost=bill_uc,
+            export_total=Coalesce(
+                NullIf(F("total_amount"), Value(_ZERO), output_field=_TX_AMOUNT),
+                ExpressionWrapper(
+                    Cast("quantity", _TX_AMOUNT) * Coalesce(
+                        bill_uc,
+                        NullIf(Cast("po_unit_cost", _TX_AMOUNT), Value(_ZERO), output_field=_TX_AMOUNT),
+                        Value(_ZERO),
+                        output_field=_TX_AMOUNT,
+                    ),
+                    output_field=_TX_AMOUNT,
+                ),
+                output_field=_TX_AMOUNT,
+            ),
+            export_notes=F(notes_field) if notes_field else Value("", output_field=CharField()),
+        )
+        .values_list(
+            "uuid", "created",
+            "item_model__uuid", "item_model__item_number", "item_model__name",
+            "item_model__sku", "item_model__uom__name",
+            "po_model__po_number", "bill_model__bill_number", "invoice_model__invoice_number",
+            "po_item_status", "entity_unit__name",
+            "quantity", "po_unit_cost", "export_bill_unit_cost", "export_total",
+            "export_notes",
+        )
     )
 
-    resp = HttpResponse(content_type="text/csv")
+    resp = StreamingHttpResponse(_itx_tx_detail_rows(qs), content_type="text/csv")
     resp["Content-Disposition"] = f'attachment; filename="{smart_str(entity.slug)}_itx_transactions.csv"'
-    w = csv.writer(resp)
-    w.writerow([
-        "tx_uuid", "created",
-        "item_uuid", "item_number", "item_name", "sku", "uom",
-        "po_number", "bill_number", "invoice_number",
-        "po_item_status", "entity_unit",
-        "quantity", "po_unit_cost", "bill_unit_cost", "total_amount",
-        "notes",
-    ])
-
-    for tx in qs:
-        item = tx.item_model
-        # Be defensive with attribute names and types
-        qty = _d(getattr(tx, "quantity", 0))
-        po_uc = _d(getattr(tx, "po_unit_cost", None))
-        bill_uc = _d(getattr(tx, "unit_cost", None) or getattr(tx, "cost_per_unit", None))
-        total = _d(getattr(tx, "total_amount", None) or (qty * (bill_uc or po_uc or Decimal("0"))))
-
-        w.writerow([
-            str(tx.uuid), getattr(tx, "created", ""),
-            str(item.uuid) if item else "", getattr(item, "item_number", ""), getattr(item, "item_name", ""),
-            getattr(item, "sku", ""), getattr(item, "uom", ""),
-            getattr(getattr(tx, "po_model", None), "po_number", ""),
-            getattr(getattr(tx, "bill_model", None), "bill_number", ""),
-            getattr(getattr(tx, "invoice_model", None), "invoice_number", ""),
-            getattr(tx, "po_item_status", ""),
-            getattr(getattr(tx, "entity_unit", None), "name", ""),
-            qty, po_uc, bill_uc, total,
-            (getattr(tx, "desc", None) or getattr(tx, "description", "") or ""),
-        ])
+    return _gzip_if_accepted(request, resp)
+
+
+_ACCEPTS_GZIP_RE = re.compile(r"\bgzip\b")
+
+
+def _gzip_if_accepted(request, resp):
+    """
+    Gzip a CSV export for clients that accept it (what GZipMiddleware would do,
+    scoped to these downloads). The repeated uuids and zero amounts compress
+    well; streaming responses are compressed chunk by chunk.
+    """
+    patch_vary_headers(resp, ("Accept-Encoding",))
+    if not _ACCEPTS_GZIP_RE.search(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+        return resp
+
+    if resp.streaming:
+        resp.streaming_content = compress_sequence(resp.streaming_content)
+    else:
+        resp.content = compress_string(resp.content)
+        resp["Content-Length"] = str(len(resp.content))
+    resp["Content-Encoding"] = "gzip"
     return resp
 
 
+_TX_AMOUNT = DecimalField(max_digits=20, decimal_places=4)
+_TX_DETAIL_CHUNK = 2000
+
+
+@lru_cache(maxsize=None)
+def _tx_detail_optional_fields():
+    """
+    (bill unit cost field, notes field) on ItemTransactionModel, each None if
+    this Django Ledger version doesn't have one. Resolved once per process.
+    """
+    field_names = {f.name for f in ItemTransactionModel._meta.concrete_fields}
+    bill_cost = next((n for n in ("unit_cost", "cost_per_unit") if n in field_names), None)
+    notes = next((n for n in ("desc", "description") if n in field_names), None)
+    return bill_cost, notes
+
+
+def _itx_tx_detail_rows(qs):
+    """
+    Yield the transaction detail CSV a chunk of rows at a time, reading the
+    queryset in chunks so the export never holds every transaction in memory.
+    """
+    buf = io.StringIO()
+    buf.write(_TX_DETAIL_HEADER)
+    w = csv.writer(buf)
+
+    batch = []
+    # csv.writer already writes None as an empty cell; only the four amounts
+    # need rounding for display.
+    for row in qs.iterator(chunk_size=_TX_DETAIL_CHUNK):
+        batch.append(row[:12] + (_d(row[12]), _d(row[13]), _d(row[14]), _d(row[15]), row[16]))
+        if len(batch) >= _TX_DETAIL_CHUNK:
+            w.writerows(batch)
+            batch.clear()
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+
+    w.writerows(batch)
+    yield buf.getvalue()
+
+
+_ZERO = Decimal("0")
+# Quantize exponents by decimal places, built once instead of per cell.
+_QUANTUMS = {places: Decimal(1).scaleb(-places) for places in range(7)}
+_Q = _QUANTUMS[3]
+
+
 def _d(value, places=3):
     """
     Safe decimal formatting helper: normalizes floats/None to Decimal and returns
     a plain number (string coercion handled by csv.writer).
     """
     if value is None:
-        return Decimal("0")
-    if isinstance(value, float):
-        value = Decimal(str(value))
+        return _ZERO
+    t = type(value)
+    if t is float:
+        # Via the shortest repr, so 541.4125 rounds as the 541.4125 it prints
+        # as, not as its binary value (541.41249999...).
+        value = Decimal(repr(value))
+    elif t is not Decimal:
+        return value
+    q = _Q if places == 3 else (_QUANTUMS.get(places) or Decimal(1).scaleb(-places))
     try:
-        return value.quantize(Decimal("0.001")) if isinstance(value, Decimal) else value
-    except Exception:
+        return value.quantize(q)
+    except InvalidOperation:
+        # too many digits for the context precision; leave it unrounded
         return value
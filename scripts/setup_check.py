@@ -7,6 +7,16 @@ Verifies that all prerequisites are met before running sync
 import os
 import sys
 
+# Snapshot of the process environment, read once at import; every check looks
+# keys up here so they all see the same values.
+_ENV = dict(os.environ)
+
+
+def refresh_env():
+    """Re-read the process environment into the module snapshot."""
+    global _ENV
+    _ENV = dict(os.environ)
+
 
 def check_python_version():
     """Check Python version"""
@@ -39,7 +49,7 @@ def check_environment_variables():
     
     issues = []
     
-    jobber_key = os.environ.get("JOBBER_API_KEY")
+    jobber_key = _ENV.get("JOBBER_API_KEY")
     if not jobber_key:
         print("❌ JOBBER_API_KEY not set")
         issues.append("JOBBER_API_KEY")
@@ -47,7 +57,7 @@ def check_environment_variables():
         masked = jobber_key[:10] + "..." + jobber_key[-4:] if len(jobber_key) > 14 else "***"
         print(f"✓ JOBBER_API_KEY set: {masked}")
     
-    ledgerlink_key = os.environ.get("LEDGERLINK_API_KEY")
+    ledgerlink_key = _ENV.get("LEDGERLINK_API_KEY")
     if not ledgerlink_key:
         print("❌ LEDGERLINK_API_KEY not set")
         issues.append("LEDGERLINK_API_KEY")
@@ -65,128 +75,176 @@ def check_environment_variables():
     return True
 
 
+JOBBER_GRAPHQL_URL = "https://api.getjobber.com/api/graphql"
+LEDGERLINK_GRAPHQL_URL = "https://api.ledgerlink.io/graphql"
+
+JOBBER_VIEWER_QUERY = """
+query { 
+  viewer { 
+    account { 
+      name 
+    } 
+  } 
+}
+"""
+
+LEDGERLINK_VIEWER_QUERY = """
+query { 
+  viewer { 
+    email 
+  } 
+}
+"""
+
+
+_SESSION = None
+
+
+def _get_session():
+    """
+    Process-wide requests.Session with pooled keep-alive connections and a
+    short retry on gateway errors. Built lazily because `requests` may not be
+    installed yet when this script is run (see check_dependencies).
+    """
+    global _SESSION
+    if _SESSION is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=2,
+            backoff_factor=0.3,
+            status_forcelist=(502, 503, 504),
+            # The probes are read-only GraphQL queries, so retrying POST is safe.
+            allowed_methods=frozenset({"POST"}),
+            raise_on_status=False,
+        )
+        _SESSION = requests.Session()
+        _SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry))
+    return _SESSION
+
+
+def _probe(session, name, url, headers, query, describe, auth_hint):
+    """
+    POST one GraphQL probe and return (ok, lines) instead of printing, so
+    concurrent probes can report in a fixed order.
+    """
+    import requests
+
+    try:
+        response = session.post(url, json={"query": query}, headers=headers, timeout=10)
+        # Parsed here so a non-JSON 200 body (requests' JSONDecodeError is a
+        # RequestException) is reported like any other failed probe.
+        data = response.json() if response.status_code == 200 else None
+    except requests.exceptions.RequestException as e:
+        return False, [f"❌ Cannot connect to {name} API: {str(e)}"]
+
+    if response.status_code == 200:
+        if "data" in data and "viewer" in data["data"]:
+            return True, [f"✓ {name} API connected: {describe(data['data']['viewer'])}"]
+        return True, [
+            f"⚠️  {name} API returned unexpected response",
+            f"   Response: {data}",
+        ]
+    if response.status_code == 401:
+        return False, [f"❌ {name} API authentication failed"] + auth_hint
+    return False, [f"⚠️  {name} API returned status {response.status_code}"]
+
+
 def check_api_connectivity():
     """Test API connectivity"""
     print("\nChecking API connectivity...")
     
-    jobber_key = os.environ.get("JOBBER_API_KEY")
-    ledgerlink_key = os.environ.get("LEDGERLINK_API_KEY")
+    jobber_key = _ENV.get("JOBBER_API_KEY")
+    ledgerlink_key = _ENV.get("LEDGERLINK_API_KEY")
     
     if not jobber_key or not ledgerlink_key:
         print("⊘ Skipping connectivity check (missing API keys)")
         return True  # Don't fail setup if keys aren't set yet
     
-    import requests
-    
-    # Test Jobber API
-    try:
-        headers = {
-            "Authorization": f"Bearer {jobber_key}",
-            "Content-Type": "application/json",
-            "X-JOBBER-GRAPHQL-VERSION": "2025-04-16"
-        }
-        query = """
-        query { 
-          viewer { 
-            account { 
-              name 
-            } 
-          } 
-        }
-        """
-        response = requests.post(
-            "https://api.getjobber.com/api/graphql",
-            json={"query": query},
-            headers=headers,
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            if "data" in data and "viewer" in data["data"]:
-                account_name = data["data"]["viewer"]["account"]["name"]
-                print(f"✓ Jobber API connected: {account_name}")
-            else:
-                print("⚠️  Jobber API returned unexpected response")
-                print(f"   Response: {data}")
-        elif response.status_code == 401:
-            print("❌ Jobber API authentication failed")
-            print("   Your API token may be expired. Get a fresh token from:")
-            print("   https://developer.getjobber.com/")
-            return False
-        else:
-            print(f"⚠️  Jobber API returned status {response.status_code}")
-            return False
-            
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Cannot connect to Jobber API: {str(e)}")
-        return False
-    
-    # Test LedgerLink API
-    try:
-        headers = {
-            "Authorization": f"Bearer {ledgerlink_key}",
-            "Content-Type": "application/json"
-        }
-        query = """
-        query { 
-          viewer { 
-            email 
-          } 
-        }
-        """
-        response = requests.post(
-            "https://api.ledgerlink.io/graphql",
-            json={"query": query},
-            headers=headers,
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            if "data" in data and "viewer" in data["data"]:
-                email = data["data"]["viewer"]["email"]
-                print(f"✓ LedgerLink API connected: {email}")
-            else:
-                print("⚠️  LedgerLink API returned unexpected response")
-        elif response.status_code == 401:
-            print("❌ LedgerLink API authentication failed")
-            print("   Check your API token")
-            return False
-        else:
-            print(f"⚠️  LedgerLink API returned status {response.status_code}")
-            return False
-            
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Cannot connect to LedgerLink API: {str(e)}")
-        return False
-    
-    return True
+    from concurrent.futures import ThreadPoolExecutor
+
+    tasks = [
+        (
+            "Jobber",
+            JOBBER_GRAPHQL_URL,
+            {
+                "Authorization": f"Bearer {jobber_key}",
+                "Content-Type": "application/json",
+                "X-JOBBER-GRAPHQL-VERSION": "2025-04-16"
+            },
+            JOBBER_VIEWER_QUERY,
+            lambda viewer: viewer["account"]["name"],
+            [
+                "   Your API token may be expired. Get a fresh token from:",
+                "   https://developer.getjobber.com/",
+            ],
+        ),
+        (
+            "LedgerLink",
+            LEDGERLINK_GRAPHQL_URL,
+            {
+                "Authorization": f"Bearer {ledgerlink_key}",
+                "Content-Type": "application/json"
+            },
+            LEDGERLINK_VIEWER_QUERY,
+            lambda viewer: viewer["email"],
+            ["   Check your API token"],
+        ),
+    ]
+
+    # Both probes are network-bound, so run them side by side: the check
+    # takes as long as the slower API rather than the sum of both.
+    session = _get_session()
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        results = list(ex.map(lambda task: _probe(session, *task), tasks))
+
+    for _, lines in results:
+        for line in lines:
+            print(line)
+
+    return all(ok for ok, _ in results)
+
+
+SERVICE_FILES_BASE = "forbes_lawn_accounting"
+
+REQUIRED_FILES = {
+    "services": (
+        "service_items_sync_service.py",
+        "invoice_sync_service.py",
+        "payment_sync_service.py",
+    ),
+    "management/commands": (
+        "sync_all.py",
+        "sync_invoices.py",
+        "sync_payments.py",
+        "sync_service_items.py",
+    ),
+}
 
 
 def check_files():
     """Check if sync service files exist"""
     print("\nChecking service files...")
     
-    required_files = [
-        "forbes_lawn_accounting/services/service_items_sync_service.py",
-        "forbes_lawn_accounting/services/invoice_sync_service.py",
-        "forbes_lawn_accounting/services/payment_sync_service.py",
-        "forbes_lawn_accounting/management/commands/sync_all.py",
-        "forbes_lawn_accounting/management/commands/sync_invoices.py",
-        "forbes_lawn_accounting/management/commands/sync_payments.py",
-        "forbes_lawn_accounting/management/commands/sync_service_items.py"
-    ]
-    
     missing = []
-    for file in required_files:
-        if os.path.exists(file):
-            # Show just the filename for cleaner output
-            filename = file.split('/')[-1]
-            print(f"✓ {filename}")
-        else:
-            print(f"❌ {file} not found")
-            missing.append(file)
+    for subdir, filenames in REQUIRED_FILES.items():
+        directory = os.path.join(SERVICE_FILES_BASE, subdir)
+        # One directory listing per folder instead of a stat() per file.
+        try:
+            with os.scandir(directory) as entries:
+                present = {entry.name for entry in entries if entry.is_file()}
+        except FileNotFoundError:
+            present = set()
+
+        for filename in filenames:
+            if filename in present:
+                print(f"✓ {filename}")
+            else:
+                path = f"{SERVICE_FILES_BASE}/{subdir}/{filename}"
+                print(f"❌ {path} not found")
+                missing.append(path)
     
     if missing:
         print("\n⚠️  Missing required files.")
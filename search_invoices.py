@@ -5,6 +5,8 @@ Search for invoices - show what's available
 import requests
 import os
 import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 JOBBER_API_KEY = os.environ.get("JOBBER_API_KEY")
 API_VERSION = "2025-04-16"
@@ -15,13 +17,32 @@ headers = {
     "X-JOBBER-GRAPHQL-VERSION": API_VERSION
 }
 
+# Keep-alive connection pool, retrying gateway errors on this read-only query
+session = requests.Session()
+session.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"POST"}),
+        raise_on_status=False,
+    ),
+))
+
 print("="*70)
 print("Searching for Recent Invoices")
 print("="*70)
 
-# Get most recent invoices
+# Account name and most recent invoices, fetched in one document/round-trip
 query = """
 query {
+  viewer {
+    account {
+      name
+    }
+  }
   invoices(first: 10) {
     nodes {
       id
@@ -43,7 +64,7 @@ query {
 """
 
 try:
-    response = requests.post(
+    response = session.post(
         "https://api.getjobber.com/api/graphql",
         json={"query": query},
         headers=headers
@@ -55,6 +76,7 @@ try:
         print("❌ Errors:")
         print(json.dumps(data["errors"], indent=2))
     else:
+        print(f"Account: {data['data']['viewer']['account']['name']}")
         invoices = data["data"]["invoices"]["nodes"]
         
         if len(invoices) == 0:
@@ -2,6 +2,8 @@ from decimal import Decimal
 from os import name
 from xml.sax.expatreader import ExpatLocator
 from django.contrib import admin
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Coalesce, Concat, NullIf
 from django.utils.html import format_html
 from django_ledger.models.items import ItemModel
 from django_ledger.models.entity import EntityModel
@@ -13,6 +15,13 @@ from .models import (
     PendingReceipt
 )
 
+# The item's number, or its uuid when it has none, computed in SQL so the
+# changelists' item column needs no per-row fetch of the item.
+_ITEM_NUMBER_OR_UUID = Coalesce(
+    NullIf("item__item_number", Value("")),
+    Cast("item__uuid", output_field=CharField()),
+)
+
 
 @admin.register(Location)
 class LocationAdmin(admin.ModelAdmin):
@@ -44,6 +53,7 @@ class StockAllocationAdmin(admin.ModelAdmin):
         "updated",
     )
     list_display = ("item_display","location","quantity","status","updated",)
+    list_select_related = ("location",)
     search_fields = ("item__name","item--item_number", "item__sku", "location__name","location__slug",)
     autocomplete_fields = ("item",'location' )
     readonly_fields = ("on_hand_readonly", "allocated_total_readonly", "unallocated_readonly")
@@ -65,22 +75,43 @@ class StockAllocationAdmin(admin.ModelAdmin):
     )
     
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            item_label=Concat("item__name", Value(" "), _ITEM_NUMBER_OR_UUID, output_field=CharField()),
+        )
+
+    def get_object(self, request, object_id, from_field=None):
+        # The change form's read-only fields show the item's allocated total
+        # several times; run its SUM once here and let them all reuse it.
+        obj = super().get_object(request, object_id, from_field)
+        if obj is not None:
+            obj._alloc_total = StockAllocation.allocated_total(obj.item)
+        return obj
+
+    def _allocated_total(self, obj):
+        if not hasattr(obj, "_alloc_total"):
+            return StockAllocation.allocated_total(obj.item)
+        return obj._alloc_total
     
     def item_display(self, obj):
+        label = getattr(obj, "item_label", None)
+        if label is not None:
+            return label
         num=getattr(obj.item, 'item_number', None) or getattr(obj.item, 'uuid', "")
         return f"{obj.item.name} {num}"
     item_display.short_description = "Item"
+    item_display.admin_order_field = "item_label"
 
     def on_hand_display(self, obj):
         return StockAllocation.on_hand_qty(obj.item)
     on_hand_display.short_description = "Allocated (all locations)"
 
     def allocated_total_display(self, obj):
-        return StockAllocation.allocated_total(obj.item)
+        return self._allocated_total(obj)
     allocated_total_display.short_description = "Allocated (all locations)"
 
     def unallocated_display(self, obj):
-        return StockAllocation.unallocated_qty(obj.item)
+        return StockAllocation.unallocated_qty(obj.item, allocated=self._allocated_total(obj))
     unallocated_display.short_description = "Unallocated"
 
     # read-only fields in form
@@ -109,7 +140,19 @@ class PendingReceiptAdmin(admin.ModelAdmin):
     search_fields = ("item__name", "item__sku", "vendor_name", "po_or_bill_ref", "note")
     autocomplete_fields = ("item", "location")
     date_hierarchy = "created"
+    list_select_related = ("location",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            item_label=Concat(
+                "item__name", Value(" ("), _ITEM_NUMBER_OR_UUID, Value(")"), output_field=CharField()
+            ),
+        )
 
     def item_display(self, obj):
+        label = getattr(obj, "item_label", None)
+        if label is not None:
+            return label
         return f"{obj.item.name} ({obj.item.item_number or obj.item.uuid})"
+    item_display.admin_order_field = "item_label"
 
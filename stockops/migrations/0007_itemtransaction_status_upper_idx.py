@@ -0,0 +1,24 @@
+from django.db import migrations
+
+# Django Ledger's ItemTransactionModel table belongs to a third-party app, so the
+# index is created here with raw SQL. On PostgreSQL `po_item_status__iexact=...`
+# compiles to UPPER(po_item_status) = UPPER(%s), which this expression index serves.
+SQL_CREATE = """
+CREATE INDEX IF NOT EXISTS itm_tx_status_upper_idx
+    ON django_ledger_itemtransactionmodel (UPPER(po_item_status));
+"""
+
+SQL_DROP = """
+DROP INDEX IF EXISTS itm_tx_status_upper_idx;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stockops', '0006_alter_stockallocation_unique_together'),
+    ]
+
+    operations = [
+        migrations.RunSQL(SQL_CREATE, reverse_sql=SQL_DROP),
+    ]
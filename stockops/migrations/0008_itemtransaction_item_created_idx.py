@@ -0,0 +1,25 @@
+from django.db import migrations
+
+# The ITx transaction detail export filters Django Ledger's item transactions by
+# their items' entity and orders by `created`; with (item_model_id, created)
+# Postgres can read each item's transactions already in order instead of
+# sorting the whole filtered set. Raw SQL because the table is third-party.
+SQL_CREATE = """
+CREATE INDEX IF NOT EXISTS itx_itemmodel_created_idx
+    ON django_ledger_itemtransactionmodel (item_model_id, created);
+"""
+
+SQL_DROP = """
+DROP INDEX IF EXISTS itx_itemmodel_created_idx;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stockops', '0007_itemtransaction_status_upper_idx'),
+    ]
+
+    operations = [
+        migrations.RunSQL(SQL_CREATE, reverse_sql=SQL_DROP),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stockops', '0008_itemtransaction_item_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockallocation',
+            index=models.Index(fields=['item', 'location'], include=('quantity',), name='stockalloc_item_loc_idx'),
+        ),
+    ]
@@ -4,7 +4,8 @@ from django.utils.timezone import now
 from decimal import Decimal
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
 from django.db.models.functions import Coalesce
 from django.db.models import DecimalField
 
@@ -14,6 +15,15 @@ from django_ledger.models.items import ItemModel
 
 User = get_user_model()
 
+# Upper bound on how long a per-entity on-hand index is kept (keys also change
+# as soon as a transaction of the entity is updated).
+ON_HAND_CACHE_TTL = 300
+
+# Quantities are stored with 3 decimal places; shared quantize exponent and zero
+# so hot paths don't parse a new Decimal literal on every call.
+THREEPLACES = Decimal("0.001")
+_ZERO = Decimal("0")
+
 
 class Location(models.Model):
     # NEW: keep a clear link to the entity the location lives under
@@ -62,28 +72,63 @@ class StockAllocation(models.Model):
     class Meta:
         verbose_name = "Stock Allocation"
         verbose_name_plural = "Stock Allocations"
+        indexes = [
+            # Serves (item, location) lookups in apply_transfer() and, via the
+            # leading column plus INCLUDE, index-only SUM(quantity) per item.
+            models.Index(fields=["item", "location"], include=["quantity"], name="stockalloc_item_loc_idx"),
+        ]
 
     def __str__(self):
         return f"{self.item.name} @ {self.location.name} = {self.quantity}"
 
     @staticmethod
-    def on_hand_qty(item) -> Decimal:
+    def _build_inventory_index(entity_id) -> dict:
+        """
+        {item uuid: on-hand} from the ledger's inventory_count() for one entity.
+        """
+        # One row per item (values() + GROUP BY), keyed by item_model_id.
+        return {
+            r["item_model_id"]: r["quantity_onhand"]
+            for r in ItemTransactionModel.objects.inventory_count(entity_model=entity_id)
+        }
+
+    @staticmethod
+    def _inventory_index(entity_id) -> dict:
+        """
+        Cached _build_inventory_index().
+
+        The key carries the count and latest `updated` stamp of the entity's
+        transactions, so new activity and deletions yield a fresh key. Writes
+        that touch neither (QuerySet.update(), bulk_update() without `updated`)
+        are only picked up after ON_HAND_CACHE_TTL, which is why validation
+        reads the ledger directly (on_hand_qty(..., fresh=True)).
+        """
+        version = ItemTransactionModel.objects.filter(
+            item_model__entity_id=entity_id
+        ).aggregate(m=Max("updated"), n=Count("pk"))
+        key = "stockops:onhand:{}:{}:{}".format(
+            entity_id,
+            version["m"].timestamp() if version["m"] else 0,
+            version["n"],
+        )
+        index = cache.get(key)
+        if index is None:
+            index = StockAllocation._build_inventory_index(entity_id)
+            cache.set(key, index, ON_HAND_CACHE_TTL)
+        return index
+
+    @staticmethod
+    def on_hand_qty(item, fresh: bool = False) -> Decimal:
         # (Leaving your logic; we can refine later)
-        q = Decimal("0")
-        try:
-            qs = ItemModel.objects.inventory_count(entity_model=item.entity_id)
-            row = None
-            for r in qs:
-                k = r.get("item_model_id") or r.get("item_model__uuid") or r.get("item_model")
-                if k == item.uuid:
-                    row = r
-                    break
-            if row:
-                v = row.get("quantity_onhand") or row.get("qty_on_hand") or row.get("onhand")
-                if v is not None:
-                    q = Decimal(v)
-        except Exception:
-            pass
+        # fresh=True bypasses the on-hand cache (used when validating allocations).
+        q = _ZERO
+        if fresh:
+            index = StockAllocation._build_inventory_index(item.entity_id)
+        else:
+            index = StockAllocation._inventory_index(item.entity_id)
+        v = index.get(item.uuid)
+        if v is not None:
+            q = Decimal(v)
 
         if q == 0:
             agg = (
@@ -100,17 +145,22 @@ class StockAllocation(models.Model):
             )
         )
     )   
+            q = Decimal(agg['net'] or 0)
 
-        return Decimal(agg['net'] or 0).quantize(Decimal('0.001'))
+        return q.quantize(THREEPLACES)
 
     @staticmethod
     def allocated_total(item: ItemModel) -> Decimal:
         agg = StockAllocation.objects.filter(item=item).aggregate(total=models.Sum("quantity"))
-        return (Decimal(agg["total"] or 0)).quantize(Decimal("0.001"))
+        return (Decimal(agg["total"] or 0)).quantize(THREEPLACES)
 
     @staticmethod
-    def unallocated_qty(item: ItemModel) -> Decimal:
-        return (StockAllocation.on_hand_qty(item) - StockAllocation.allocated_total(item)).quantize(Decimal("0.001"))
+    def unallocated_qty(item: ItemModel, allocated: Decimal = None) -> Decimal:
+        # Callers that already hold the allocated total (e.g. an annotated
+        # queryset) pass it in to skip the SUM query.
+        if allocated is None:
+            allocated = StockAllocation.allocated_total(item)
+        return (StockAllocation.on_hand_qty(item) - allocated).quantize(THREEPLACES)
 
     def clean(self):
         super().clean()
@@ -120,10 +170,10 @@ class StockAllocation(models.Model):
         current_total = (
             StockAllocation.objects.filter(item=self.item)
             .exclude(pk=self.pk)
-            .aggregate(total=models.Sum("quantity"))["total"] or Decimal("0")
+            .aggregate(total=models.Sum("quantity"))["total"] or _ZERO
         )
-        proposed_total = (current_total + (self.quantity or Decimal("0"))).quantize(Decimal("0.001"))
-        on_hand = StockAllocation.on_hand_qty(self.item)
+        proposed_total = (current_total + (self.quantity or _ZERO)).quantize(THREEPLACES)
+        on_hand = StockAllocation.on_hand_qty(self.item, fresh=True)
 
         if proposed_total > on_hand:
             raise ValidationError(
@@ -163,30 +213,59 @@ class StockTransfer(models.Model):
             )
 
     def apply_transfer(self):
-        with transaction.atomic():
-            from_alloc, _ = StockAllocation.objects.select_for_update().get_or_create(
-                item=self.item, location=self.from_location
-            )
-            to_alloc, _ = StockAllocation.objects.select_for_update().get_or_create(
-                item=self.item, location=self.to_location
-            )
-
-            if from_alloc.quantity < self.quantity:
+        # savepoint=False: save() already runs this inside its own atomic block,
+        # so there is nothing to gain from a nested SAVEPOINT round-trip.
+        with transaction.atomic(savepoint=False):
+            # Lock both allocation rows with a single SELECT ... FOR UPDATE.
+            allocs = {}
+            for alloc in (
+                StockAllocation.objects.select_for_update()
+                .filter(item=self.item, location_id__in=(self.from_location_id, self.to_location_id))
+                .order_by("pk")
+            ):
+                if alloc.location_id in allocs:
+                    raise StockAllocation.MultipleObjectsReturned(
+                        f"More than one allocation for {self.item} at location {alloc.location_id}."
+                    )
+                allocs[alloc.location_id] = alloc
+
+            # Also enforced here for saves that skip full_clean(): a non-positive
+            # move would otherwise pass the availability check below.
+            if self.quantity <= 0:
+                raise ValidationError("Transfer quantity must be > 0.")
+
+            from_alloc = allocs.get(self.from_location_id)
+            available = from_alloc.quantity if from_alloc else _ZERO
+            if from_alloc is None or available < self.quantity:
                 raise ValidationError(
                     f"Not enough at {self.from_location}. "
-                    f"Available={from_alloc.quantity}, requested move={self.quantity}."
+                    f"Available={available}, requested move={self.quantity}."
                 )
 
-            from_alloc.quantity = (from_alloc.quantity - self.quantity).quantize(Decimal("0.001"))
-            to_alloc.quantity = (to_alloc.quantity + self.quantity).quantize(Decimal("0.001"))
-
-            from_alloc.full_clean(); to_alloc.full_clean()
-            from_alloc.save(); to_alloc.save()
+            # A transfer moves quantity between two rows of the same item, so the
+            # item's total allocation (checked against on-hand by clean()) is
+            # unchanged and the from-row cannot go negative after the check above;
+            # the per-row full_clean() re-validation is therefore skipped.
+            stamp = now()
+            from_alloc.quantity = (from_alloc.quantity - self.quantity).quantize(THREEPLACES)
+            from_alloc.updated = stamp
+            to_alloc = allocs.get(self.to_location_id)
+            if to_alloc is None:
+                StockAllocation.objects.create(
+                    item=self.item, location_id=self.to_location_id, quantity=self.quantity
+                )
+                StockAllocation.objects.bulk_update([from_alloc], ["quantity", "updated"])
+            else:
+                to_alloc.quantity = (to_alloc.quantity + self.quantity).quantize(THREEPLACES)
+                to_alloc.updated = stamp
+                StockAllocation.objects.bulk_update([from_alloc, to_alloc], ["quantity", "updated"])
 
     def save(self, *args, **kwargs):
         creating = self.pk is None
-        super().save(*args, **kwargs)
-        self.apply_transfer()
+        # The transfer row and the allocation moves commit or roll back together.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.apply_transfer()
 
 
 class StatusOverlay(models.Model):
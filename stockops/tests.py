@@ -1,3 +1,47 @@
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+from uuid import uuid4
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from django_ledger.models import ItemTransactionModel
+
+from .models import StockAllocation
+
+
+class OnHandQtyTests(TestCase):
+    """
+    on_hand_qty() reading from a populated inventory_count() index.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.item = SimpleNamespace(uuid=uuid4(), entity_id=uuid4())
+        self.rows = [
+            {"item_model_id": uuid4(), "quantity_onhand": Decimal("9")},
+            {"item_model_id": self.item.uuid, "quantity_onhand": Decimal("4.5")},
+        ]
+
+    def _patch_inventory_count(self):
+        return mock.patch.object(
+            ItemTransactionModel.objects, "inventory_count", return_value=self.rows
+        )
+
+    def test_non_zero_on_hand_comes_from_index(self):
+        with self._patch_inventory_count() as inventory_count:
+            self.assertEqual(StockAllocation.on_hand_qty(self.item), Decimal("4.500"))
+        inventory_count.assert_called_once_with(entity_model=self.item.entity_id)
+
+    def test_index_is_cached_per_entity(self):
+        with self._patch_inventory_count() as inventory_count:
+            StockAllocation.on_hand_qty(self.item)
+            StockAllocation.on_hand_qty(self.item)
+        self.assertEqual(inventory_count.call_count, 1)
+
+    def test_fresh_bypasses_cache(self):
+        with self._patch_inventory_count() as inventory_count:
+            StockAllocation.on_hand_qty(self.item)
+            self.assertEqual(StockAllocation.on_hand_qty(self.item, fresh=True), Decimal("4.500"))
+        self.assertEqual(inventory_count.call_count, 2)